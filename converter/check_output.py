@@ -3,8 +3,61 @@
 Quick script to check all output folders for init.mp4 files
 """
 
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
+
+
+# Folder checks are I/O-latency bound, so use more threads than cores
+CHECK_WORKERS = 16
+
+
+@dataclass
+class FolderReport:
+    """Files found in one output folder's video directory."""
+    name: str
+    playlist_size: Optional[int]
+    init_size: Optional[int]
+    segment_count: int
+
+
+def scan_video_folder(folder_path):
+    """
+    Collect playlist, init and segment info from a single directory sweep.
+    
+    Args:
+        folder_path: Path to an output folder (the parent of video/)
+        
+    Returns:
+        FolderReport, or None if the folder has no video directory
+    """
+    video_folder = os.path.join(folder_path, "video")
+    playlist_size = None
+    init_size = None
+    segment_count = 0
+    
+    try:
+        with os.scandir(video_folder) as it:
+            for entry in it:
+                name = entry.name
+                if name == "video.m3u8":
+                    playlist_size = entry.stat().st_size
+                elif name == "init.mp4":
+                    init_size = entry.stat().st_size
+                elif name.startswith("video") and name.endswith(".m4s"):
+                    segment_count += 1
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    
+    return FolderReport(
+        name=os.path.basename(folder_path),
+        playlist_size=playlist_size,
+        init_size=init_size,
+        segment_count=segment_count
+    )
 
 
 def check_output_directory(output_dir):
@@ -18,43 +71,44 @@ def check_output_directory(output_dir):
     print(f"Checking output directory: {output_path}")
     print("=" * 70)
     
-    # Find all video folders
-    video_folders = []
-    for item in output_path.iterdir():
-        if item.is_dir():
-            video_folder = item / "video"
-            if video_folder.exists():
-                video_folders.append(video_folder)
+    # Find all output folders, then check their video folders concurrently
+    with os.scandir(output_path) as it:
+        folder_paths = [entry.path for entry in it if entry.is_dir()]
+    
+    reports = []
+    if folder_paths:
+        with ThreadPoolExecutor(max_workers=min(CHECK_WORKERS, len(folder_paths))) as executor:
+            futures = [executor.submit(scan_video_folder, path) for path in folder_paths]
+            for future in as_completed(futures):
+                report = future.result()
+                if report is not None:
+                    reports.append(report)
     
-    if not video_folders:
+    if not reports:
         print("No video folders found in output directory")
         return
     
-    print(f"Found {len(video_folders)} video folder(s)\n")
+    print(f"Found {len(reports)} video folder(s)\n")
     
     missing_init = []
     empty_init = []
     valid_init = []
     
-    for video_folder in sorted(video_folders):
-        folder_name = video_folder.parent.name
-        init_file = video_folder / "init.mp4"
-        playlist_file = video_folder / "video.m3u8"
+    for report in sorted(reports, key=lambda r: r.name):
+        folder_name = report.name
         
         print(f"📁 {folder_name}/video/")
         
         # Check playlist
-        if playlist_file.exists():
-            size = playlist_file.stat().st_size
-            print(f"   ✓ video.m3u8 ({size} bytes)")
+        if report.playlist_size is not None:
+            print(f"   ✓ video.m3u8 ({report.playlist_size} bytes)")
         else:
             print(f"   ❌ video.m3u8 MISSING")
         
         # Check init.mp4
-        if init_file.exists():
-            size = init_file.stat().st_size
-            if size > 0:
-                print(f"   ✓ init.mp4 ({size} bytes)")
+        if report.init_size is not None:
+            if report.init_size > 0:
+                print(f"   ✓ init.mp4 ({report.init_size} bytes)")
                 valid_init.append(folder_name)
             else:
                 print(f"   ❌ init.mp4 EMPTY (0 bytes)")
@@ -64,9 +118,8 @@ def check_output_directory(output_dir):
             missing_init.append(folder_name)
         
         # Check segments
-        segments = sorted(video_folder.glob("video*.m4s"))
-        if segments:
-            print(f"   ✓ {len(segments)} segment file(s)")
+        if report.segment_count:
+            print(f"   ✓ {report.segment_count} segment file(s)")
         else:
             print(f"   ❌ No segment files")
         
@@ -76,7 +129,7 @@ def check_output_directory(output_dir):
     print("=" * 70)
     print("SUMMARY")
     print("=" * 70)
-    print(f"Total folders checked: {len(video_folders)}")
+    print(f"Total folders checked: {len(reports)}")
     print(f"✓ Valid init.mp4: {len(valid_init)}")
     print(f"❌ Empty init.mp4: {len(empty_init)}")
     print(f"❌ Missing init.mp4: {len(missing_init)}")
@@ -0,0 +1,313 @@
+"""HLS encoding that splits the source into chunks and encodes them in parallel."""
+
+import csv
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from converter.hls_encoder import (
+    DEFAULT_MAX_PARALLEL,
+    HLSEncoder,
+    TASKSET,
+    _cpu_set_queue,
+    _run_on_cpu_set,
+    _run_with_stderr_tail,
+    _write_atomic,
+)
+from converter.video_quality import QualityProfile
+
+
+# HLS segments per source chunk; longer chunks mean fewer short segments at
+# chunk boundaries, shorter ones mean more chunks to spread across cores
+DEFAULT_CHUNK_SEGMENTS = 10
+
+
+class ChunkedHLSEncoder(HLSEncoder):
+    """
+    Encodes renditions as independent chunks of the source, in parallel.
+    
+    The source video is cut once with stream copy (at its own keyframes), every
+    (rendition, chunk) pair is encoded as a separate FFmpeg run, and each
+    rendition's segments are then renumbered into one folder and listed in a
+    single playlist. Chunks are encoded with their original start time as
+    timestamp offset. Each chunk is still a separate encode with its own fMP4
+    init segment, so the playlist marks every chunk boundary with
+    EXT-X-DISCONTINUITY and points an EXT-X-MAP at that chunk's init file.
+    
+    Chunk boundaries follow the source's keyframes, so the last segment of a
+    chunk can be shorter than segment_duration.
+    """
+    
+    def __init__(self, *args, chunk_segments: int = DEFAULT_CHUNK_SEGMENTS, **kwargs):
+        """
+        Initialize ChunkedHLSEncoder.
+        
+        Args:
+            *args: Positional HLSEncoder arguments
+            chunk_segments: HLS segments per source chunk
+            **kwargs: Keyword HLSEncoder arguments; max_parallel sets how many
+                chunk encodes run at once (at least 2), pin_cpus pins each
+                running chunk encode to its own set of cores
+        """
+        super().__init__(*args, **kwargs)
+        if self.single_file:
+            raise ValueError("single_file is not supported with chunked encoding")
+        self.chunk_segments = max(1, chunk_segments)
+        # One chunk at a time only adds the split and join to a normal encode
+        if self.max_parallel < 2:
+            self.max_parallel = max(2, DEFAULT_MAX_PARALLEL)
+    
+    def encode_all(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profiles: List[QualityProfile],
+        audio_bitrate: str = "128k",
+        include_audio: bool = True
+    ) -> Dict[str, bool]:
+        """
+        Encode audio and all quality levels, spreading video chunks over max_parallel runs.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profiles: QualityProfiles to encode (H.264 and/or VP9)
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            include_audio: Also encode the audio rendition to audio/
+        
+        Returns:
+            Dict mapping each profile's folder_name (and "audio" when
+            include_audio is set) to whether its output was produced
+        """
+        results = {profile.folder_name: False for profile in profiles}
+        if include_audio:
+            results["audio"] = False
+        
+        output_dir = output_dir.absolute()
+        work_dir = output_dir / f".chunks_{uuid.uuid4().hex}"
+        
+        try:
+            work_dir.mkdir(parents=True)
+            chunks = self.split(input_video, work_dir)
+            if not chunks:
+                return results
+            
+            workers = self.max_parallel
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # The audio encode runs beside the pool, so every worker has a core set
+            free_cpus = _cpu_set_queue(workers) if self.pin_cpus else None
+            
+            # Threads are enough here: each worker just waits on its FFmpeg process
+            with ThreadPoolExecutor(max_workers=1) as audio_pool, \
+                    ThreadPoolExecutor(max_workers=workers) as pool:
+                audio = None
+                if include_audio:
+                    audio = audio_pool.submit(self.encode_audio, input_video, output_dir, audio_bitrate)
+                
+                jobs = {
+                    (profile.folder_name, index): pool.submit(
+                        _run_on_cpu_set,
+                        partial(self._encode_chunk, chunk, start,
+                                work_dir / profile.folder_name / str(index), profile),
+                        threads,
+                        free_cpus
+                    )
+                    for profile in profiles
+                    for index, (chunk, start) in enumerate(chunks)
+                }
+                done = {key: future.result() for key, future in jobs.items()}
+                
+                for profile in profiles:
+                    if not all(done[(profile.folder_name, index)] for index in range(len(chunks))):
+                        continue
+                    chunk_dirs = [
+                        work_dir / profile.folder_name / str(index)
+                        for index in range(len(chunks))
+                    ]
+                    try:
+                        results[profile.folder_name] = self._join_chunks(
+                            chunk_dirs, work_dir / profile.folder_name / "joined",
+                            output_dir / profile.folder_name, profile
+                        )
+                    except Exception as e:
+                        logging.error("Joining %s chunks failed: %s", profile.folder_name, e)
+                
+                if audio is not None:
+                    results["audio"] = audio.result()
+            
+            return results
+        
+        except Exception as e:
+            logging.error("Chunked encode failed: %s", e, exc_info=True)
+            return results
+        finally:
+            shutil.rmtree(str(work_dir), ignore_errors=True)
+    
+    def split(self, input_video: Path, work_dir: Path) -> List[Tuple[Path, float]]:
+        """
+        Cut the source's video stream into chunks without re-encoding.
+        
+        Args:
+            input_video: Path to source video file
+            work_dir: Folder to write the chunks to
+        
+        Returns:
+            (chunk path, start time in seconds) in playback order, empty on failure
+        """
+        chunk_list = work_dir / "chunks.csv"
+        command = [
+            "ffmpeg", "-y",
+            "-nostats",
+            "-loglevel", "error",
+            "-i", str(input_video.absolute()),
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-f", "segment",
+            "-segment_time", str(self.segment_duration * self.chunk_segments),
+            "-reset_timestamps", "1",
+            "-segment_list", str(chunk_list),
+            "-segment_list_type", "csv",
+            str(work_dir / "chunk%05d.mkv")
+        ]
+        
+        try:
+            returncode, stderr_tail = _run_with_stderr_tail(command, timeout=3600)
+            if returncode != 0:
+                logging.error("Splitting %s failed: %s", input_video.name, stderr_tail)
+                return []
+            
+            # Each row is "name,start,end"
+            with open(chunk_list, newline="") as f:
+                return [(work_dir / row[0], float(row[1])) for row in csv.reader(f) if row]
+        except Exception as e:
+            logging.error("Splitting %s failed: %s", input_video.name, e)
+            return []
+    
+    def _encode_chunk(
+        self,
+        chunk: Path,
+        start: float,
+        chunk_dir: Path,
+        profile: QualityProfile,
+        threads: Optional[int] = None,
+        cpus: Optional[List[int]] = None
+    ) -> bool:
+        """
+        Encode one chunk of one rendition into its own folder.
+        
+        Args:
+            chunk: Stream-copied chunk of the source
+            start: Chunk start time in the source, in seconds
+            chunk_dir: Folder for this chunk's playlist and segments
+            profile: QualityProfile to encode
+            threads: Encoder thread limit (default: let FFmpeg decide)
+            cpus: CPU ids to pin FFmpeg to with taskset (default: unpinned)
+        
+        Returns:
+            True if the chunk's playlist was written
+        """
+        try:
+            chunk_dir.mkdir(parents=True, exist_ok=True)
+            command = self._quality_command(chunk, profile, threads)
+            # Shift the chunk back to its place on the source timeline
+            command[-1:-1] = ["-output_ts_offset", f"{start:.6f}"]
+            if cpus:
+                command = [TASKSET, "-c", ",".join(map(str, cpus))] + command
+            
+            returncode, stderr_tail = _run_with_stderr_tail(command, timeout=3600, cwd=chunk_dir)
+            if returncode != 0:
+                logging.error("%s chunk %s failed: %s", profile.folder_name, chunk.name, stderr_tail)
+                return False
+            return self._verify_quality_output(chunk_dir, profile)
+        except Exception:
+            return False
+    
+    def _join_chunks(
+        self,
+        chunk_dirs: List[Path],
+        staging_dir: Path,
+        quality_dir: Path,
+        profile: QualityProfile
+    ) -> bool:
+        """
+        Move a rendition's chunk segments into quality_dir and write one playlist.
+        
+        Segments are renumbered from 1 in playback order. The header comes
+        from the first chunk's playlist, with the largest target duration of
+        all chunks. Every later chunk starts with EXT-X-DISCONTINUITY and, for
+        fMP4, an EXT-X-MAP pointing at its own init segment (init<N>.mp4).
+        
+        The rendition is assembled in staging_dir and renamed onto
+        quality_dir in one step, so a failure part way leaves no half-joined
+        folder behind.
+        
+        Args:
+            chunk_dirs: The rendition's chunk folders in playback order
+            staging_dir: Folder on the same file system to assemble it in
+            quality_dir: Final rendition folder
+            profile: QualityProfile that was encoded
+        
+        Returns:
+            True if the joined rendition was moved into place, False if a
+            chunk lacks its fMP4 init segment or no segments were listed
+        """
+        staging_dir.mkdir(parents=True)
+        fmp4 = self.segment_container(profile) == "fmp4"
+        
+        header = []
+        body = []
+        target_duration = 0
+        number = 0
+        for index, chunk_dir in enumerate(chunk_dirs):
+            init_name = "init.mp4" if index == 0 else f"init{index}.mp4"
+            if fmp4:
+                if not (chunk_dir / "init.mp4").exists():
+                    logging.error("%s chunk %d has no init.mp4", profile.folder_name, index)
+                    return False
+                os.replace(str(chunk_dir / "init.mp4"), str(staging_dir / init_name))
+            if index > 0:
+                # Each chunk was encoded on its own: its fragments restart their
+                # decode timeline and need its own init segment
+                body.append("#EXT-X-DISCONTINUITY")
+                if fmp4:
+                    body.append(f'#EXT-X-MAP:URI="{init_name}"')
+            
+            pending_extinf = None
+            for line in (chunk_dir / "video.m3u8").read_text().splitlines():
+                if line.startswith("#EXT-X-TARGETDURATION:"):
+                    target_duration = max(target_duration, int(line.split(":", 1)[1]))
+                    if index == 0:
+                        header.append(line)
+                elif line.startswith("#EXTINF:"):
+                    pending_extinf = line
+                elif line and not line.startswith("#") and pending_extinf:
+                    number += 1
+                    extension = os.path.splitext(line)[1]
+                    name = f"video{number}{extension}"
+                    os.replace(str(chunk_dir / line), str(staging_dir / name))
+                    body += [pending_extinf, name]
+                    pending_extinf = None
+                elif index == 0 and not body and line != "#EXT-X-ENDLIST":
+                    header.append(line)
+        
+        if not body:
+            return False
+        
+        header = [
+            f"#EXT-X-TARGETDURATION:{target_duration}" if line.startswith("#EXT-X-TARGETDURATION:") else line
+            for line in header
+        ]
+        _write_atomic(
+            staging_dir / "video.m3u8",
+            ("\n".join(header + body + ["#EXT-X-ENDLIST"]) + "\n").encode("utf-8")
+        )
+        
+        if quality_dir.exists():
+            shutil.rmtree(str(quality_dir))
+        os.replace(str(staging_dir), str(quality_dir))
+        return True
@@ -1,68 +1,224 @@
 """ZIP compression utilities."""
 
 import logging
+import os
+import shutil
+import tarfile
+import time
 import zipfile
 from pathlib import Path
+from typing import Iterator, Tuple
+
+
+# Extensions whose payload is already compressed; DEFLATE gains nothing on these
+STORED_EXTENSIONS = frozenset({
+    ".mp4", ".m4s", ".mkv", ".webm", ".jpg", ".jpeg", ".png", ".zip", ".gz"
+})
+
+# Fastest DEFLATE level for the remaining (small, text-like) files
+DEFLATE_LEVEL = 1
+
+# Read/write buffer size used when streaming stored files into the archive
+COPY_BUFFER_SIZE = 1 << 20
+
+# Earliest timestamp representable in a ZIP header
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# Supported archive formats:
+#   zip         - store media, deflate text-like files (default)
+#   zip_stored  - store every file uncompressed
+#   zip_deflate - deflate every file
+#   tar         - uncompressed tar, no per-file CRC or central directory
+ARCHIVE_FORMATS = ("zip", "zip_stored", "zip_deflate", "tar")
 
 
 class ZipCompressor:
     """Creates ZIP archives from directory contents."""
     
-    def __init__(self):
-        """Initialize ZipCompressor for creating ZIP archives."""
-        logging.info("ZipCompressor initialized")
+    def __init__(self, archive_format: str = "zip"):
+        """
+        Initialize ZipCompressor for creating ZIP archives.
+        
+        Args:
+            archive_format: One of ARCHIVE_FORMATS (default: "zip")
+            
+        Raises:
+            ValueError: If archive_format is not supported
+        """
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format: {archive_format}")
+        self.archive_format = archive_format
+        logging.info("ZipCompressor initialized (format: %s)", archive_format)
+    
+    @property
+    def archive_extension(self) -> str:
+        """Get the file extension matching the archive format."""
+        return ".tar" if self.archive_format == "tar" else ".zip"
     
     def compress_folder(self, folder_path: Path, output_path: Path) -> bool:
         """
-        Create ZIP archive from directory contents.
+        Create ZIP (or tar) archive from directory contents.
         
         Args:
             folder_path: Path to the folder to compress
-            output_path: Path where the ZIP file should be created
+            output_path: Path where the archive should be created
             
         Returns:
             True if compression succeeded, False otherwise
         """
         try:
-            logging.debug(f"Starting compression of {folder_path.name}")
+            logging.debug("Starting compression of %s", folder_path.name)
             
             if not folder_path.exists():
-                logging.error(f"Folder to compress does not exist: {folder_path}")
+                logging.error("Folder to compress does not exist: %s", folder_path)
                 return False
             
             if not folder_path.is_dir():
-                logging.error(f"Path is not a directory: {folder_path}")
+                logging.error("Path is not a directory: %s", folder_path)
                 return False
             
-            logging.info(f"Compressing {folder_path.name} to {output_path.name}")
+            logging.info("Compressing %s to %s", folder_path.name, output_path.name)
             
-            # Create ZIP archive
-            file_count = 0
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Walk through all files in the folder
-                for file_path in folder_path.rglob("*"):
-                    if file_path.is_file():
-                        try:
-                            # Calculate relative path to preserve directory structure
-                            arcname = file_path.relative_to(folder_path.parent)
-                            zipf.write(file_path, arcname=arcname)
-                            file_count += 1
-                            logging.debug(f"Added to ZIP: {arcname}")
-                        except Exception as e:
-                            logging.error(f"Error adding {file_path.name} to ZIP: {e}")
+            if self.archive_format == "tar":
+                file_count = self._write_tar(folder_path, output_path)
+            else:
+                file_count = self._write_zip(folder_path, output_path)
             
-            logging.info(f"Successfully created ZIP archive: {output_path} ({file_count} files)")
+            logging.info("Successfully created archive: %s (%s files)", output_path, file_count)
             return True
         
         except PermissionError as e:
-            logging.error(f"Permission denied creating ZIP archive: {e}")
+            logging.error("Permission denied creating ZIP archive: %s", e)
             return False
         except OSError as e:
-            logging.error(f"OS error creating ZIP archive: {e}")
+            logging.error("OS error creating ZIP archive: %s", e)
             return False
         except Exception as e:
-            logging.error(f"Error creating ZIP archive: {e}", exc_info=True)
+            logging.error("Error creating ZIP archive: %s", e, exc_info=True)
+            return False
+    
+    def _write_zip(self, folder_path: Path, output_path: Path) -> int:
+        """
+        Write the folder into a ZIP archive according to the archive format.
+        
+        Args:
+            folder_path: Path to the folder to compress
+            output_path: Path where the ZIP file should be created
+            
+        Returns:
+            Number of files added to the archive
+        """
+        file_count = 0
+        debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
+            # Walk through all files in the folder
+            for entry, arcname in self._iter_files(folder_path):
+                try:
+                    if self._should_store(entry.name):
+                        self._write_stored(zipf, entry, arcname)
+                    else:
+                        zipf.write(entry.path, arcname=arcname,
+                                   compress_type=zipfile.ZIP_DEFLATED,
+                                   compresslevel=DEFLATE_LEVEL)
+                    file_count += 1
+                    if debug_enabled:
+                        logging.debug("Added to ZIP: %s", arcname)
+                except Exception as e:
+                    logging.error("Error adding %s to ZIP: %s", entry.name, e)
+        return file_count
+    
+    def _should_store(self, filename: str) -> bool:
+        """
+        Decide whether a file is stored uncompressed in a ZIP archive.
+        
+        Args:
+            filename: Name of the file
+            
+        Returns:
+            True if the file should be stored, False if it should be deflated
+        """
+        if self.archive_format == "zip_stored":
+            return True
+        if self.archive_format == "zip_deflate":
             return False
+        # Store media as-is; deflate only text-like files
+        return os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS
+    
+    def _write_tar(self, folder_path: Path, output_path: Path) -> int:
+        """
+        Write the folder into an uncompressed tar archive.
+        
+        Args:
+            folder_path: Path to the folder to archive
+            output_path: Path where the tar file should be created
+            
+        Returns:
+            Number of files added to the archive
+        """
+        file_count = 0
+        debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+        # tarfile ignores bufsize outside stream modes; buffer the file itself
+        with open(output_path, 'wb', buffering=COPY_BUFFER_SIZE) as dest, \
+                tarfile.open(fileobj=dest, mode='w') as tar:
+            for entry, arcname in self._iter_files(folder_path):
+                try:
+                    tar.add(entry.path, arcname=arcname, recursive=False)
+                    file_count += 1
+                    if debug_enabled:
+                        logging.debug("Added to tar: %s", arcname)
+                except Exception as e:
+                    logging.error("Error adding %s to tar: %s", entry.name, e)
+        return file_count
+    
+    def _iter_files(self, folder_path: Path) -> Iterator[Tuple[os.DirEntry, str]]:
+        """
+        Walk a folder with os.scandir and yield its files.
+        
+        Archive names are relative to the folder's parent so the folder
+        itself is the top-level directory inside the archive.
+        
+        Args:
+            folder_path: Path to the folder to walk
+            
+        Yields:
+            Tuples of (DirEntry, archive name)
+        """
+        stack = [(str(folder_path), folder_path.name)]
+        while stack:
+            directory, prefix = stack.pop()
+            with os.scandir(directory) as it:
+                for entry in it:
+                    arcname = f"{prefix}/{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, arcname))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry, arcname
+    
+    def _write_stored(self, zipf: zipfile.ZipFile, entry: os.DirEntry, arcname: str) -> None:
+        """
+        Stream a file into the archive uncompressed using large buffers.
+        
+        Args:
+            zipf: Open ZipFile to write into
+            entry: DirEntry of the file to add
+            arcname: Name of the file inside the archive
+        """
+        st = entry.stat()
+        date_time = time.localtime(st.st_mtime)[:6]
+        if date_time < ZIP_EPOCH:
+            date_time = ZIP_EPOCH
+        
+        zinfo = zipfile.ZipInfo(arcname, date_time)
+        zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.file_size = st.st_size
+        
+        # zipfile computes the standard CRC-32 over each 1 MiB chunk; zlib
+        # releases the GIL for buffers this size. Other checksums (crc32c,
+        # xxhash) would produce archives standard readers reject.
+        with open(entry.path, 'rb', buffering=COPY_BUFFER_SIZE) as src, \
+                zipf.open(zinfo, 'w') as dest:
+            shutil.copyfileobj(src, dest, COPY_BUFFER_SIZE)
     
     def get_compressed_size(self, zip_path: Path) -> int:
         """
@@ -76,17 +232,17 @@ class ZipCompressor:
         """
         try:
             if not zip_path.exists():
-                logging.error(f"ZIP file does not exist: {zip_path}")
+                logging.error("ZIP file does not exist: %s", zip_path)
                 return 0
             
             if not zip_path.is_file():
-                logging.error(f"Path is not a file: {zip_path}")
+                logging.error("Path is not a file: %s", zip_path)
                 return 0
             
             size = zip_path.stat().st_size
-            logging.debug(f"ZIP file {zip_path.name} size: {size} bytes")
+            logging.debug("ZIP file %s size: %s bytes", zip_path.name, size)
             return size
             
         except Exception as e:
-            logging.error(f"Error getting ZIP file size: {e}")
+            logging.error("Error getting ZIP file size: %s", e)
             return 0
@@ -2,8 +2,18 @@
 
 import json
 import logging
+import os
+import stat
 from pathlib import Path
-from typing import List
+from typing import Tuple
+
+from converter.compressor import ARCHIVE_FORMATS
+
+# orjson is optional; it parses bytes directly and is faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class ConfigurationError(Exception):
@@ -21,6 +31,14 @@ class ConfigManager:
         "input_directory_path"
     ]
     
+    # (field, expected type, type description) checked by validate_config
+    _SCHEMA = (
+        ("compress", bool, "a boolean"),
+        ("delete_mp4", bool, "a boolean"),
+        ("input_directory_path", str, "a string"),
+        ("output_directory_path", str, "a string"),
+    )
+    
     def __init__(self, config_path: str = "config.json"):
         """
         Initialize ConfigManager with path to configuration file.
@@ -30,21 +48,33 @@ class ConfigManager:
         """
         self.config_path = Path(config_path)
         self._config = None
+        self._input_directory = None
+        self._output_directory = None
+        self._thumbnail_video_percentage = None
+        self._archive_format = None
         self._load_and_validate()
     
     def _load_and_validate(self):
         """Load and validate configuration on initialization."""
         try:
-            logging.info(f"Loading configuration from {self.config_path}")
+            logging.info("Loading configuration from %s", self.config_path)
             self._config = self.load_config()
             if not self.validate_config(self._config):
                 raise ConfigurationError("Configuration validation failed")
+            
+            # Build derived values once; properties return these objects
+            self._input_directory = Path(self._config["input_directory_path"]).resolve()
+            self._output_directory = Path(self._config["output_directory_path"])
+            self._thumbnail_video_percentage = tuple(
+                self._config.get("thumbnail_video_percentage", (30, 50, 70))
+            )
+            self._archive_format = self._config.get("archive_format", "zip")
             logging.info("Configuration loaded and validated successfully")
         except ConfigurationError:
-            logging.error(f"Configuration error: Failed to load or validate {self.config_path}")
+            logging.error("Configuration error: Failed to load or validate %s", self.config_path)
             raise
         except Exception as e:
-            logging.error(f"Unexpected error loading configuration: {e}")
+            logging.error("Unexpected error loading configuration: %s", e)
             raise ConfigurationError(f"Unexpected error loading configuration: {e}")
     
     def load_config(self) -> dict:
@@ -63,12 +93,12 @@ class ConfigManager:
                 logging.error(error_msg)
                 raise ConfigurationError(error_msg)
             
-            logging.debug(f"Reading configuration file: {self.config_path}")
-            with open(self.config_path, 'r') as f:
-                config = json.load(f)
+            logging.debug("Reading configuration file: %s", self.config_path)
+            data = self.config_path.read_bytes()
+            config = orjson.loads(data) if orjson is not None else json.loads(data)
             
-            logging.info(f"Configuration loaded from {self.config_path}")
-            logging.debug(f"Configuration contents: {config}")
+            logging.info("Configuration loaded from %s", self.config_path)
+            logging.debug("Configuration contents: %s", config)
             return config
             
         except json.JSONDecodeError as e:
@@ -96,70 +126,69 @@ class ConfigManager:
             ConfigurationError: If validation fails
         """
         try:
-            logging.debug("Starting configuration validation")
+            debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+            if debug_enabled:
+                logging.debug("Starting configuration validation")
             
             # Check for missing required fields
-            missing_fields = [
-                field for field in self.REQUIRED_FIELDS 
-                if field not in config
-            ]
-            
-            if missing_fields:
+            missing = set(self.REQUIRED_FIELDS).difference(config)
+            if missing:
+                missing_fields = [field for field in self.REQUIRED_FIELDS if field in missing]
                 error_msg = f"Missing required configuration fields: {', '.join(missing_fields)}"
                 logging.error(error_msg)
                 raise ConfigurationError(error_msg)
             
-            logging.debug("All required fields present")
-            
-            # Validate boolean fields
-            if not isinstance(config["compress"], bool):
-                error_msg = f"'compress' must be a boolean, got {type(config['compress']).__name__}"
-                logging.error(error_msg)
-                raise ConfigurationError(error_msg)
-            
-            if not isinstance(config["delete_mp4"], bool):
-                error_msg = f"'delete_mp4' must be a boolean, got {type(config['delete_mp4']).__name__}"
-                logging.error(error_msg)
-                raise ConfigurationError(error_msg)
-            
-            logging.debug("Boolean fields validated")
-            
-            # Validate directory paths
-            if not isinstance(config["input_directory_path"], str):
-                error_msg = f"'input_directory_path' must be a string, got {type(config['input_directory_path']).__name__}"
-                logging.error(error_msg)
-                raise ConfigurationError(error_msg)
+            # Validate field types
+            for field, expected_type, type_name in self._SCHEMA:
+                value = config[field]
+                if not isinstance(value, expected_type):
+                    error_msg = f"'{field}' must be {type_name}, got {type(value).__name__}"
+                    logging.error(error_msg)
+                    raise ConfigurationError(error_msg)
             
-            if not isinstance(config["output_directory_path"], str):
-                error_msg = f"'output_directory_path' must be a string, got {type(config['output_directory_path']).__name__}"
+            # Optional archive format used when compress is enabled
+            archive_format = config.get("archive_format", "zip")
+            if archive_format not in ARCHIVE_FORMATS:
+                error_msg = (f"'archive_format' must be one of {', '.join(ARCHIVE_FORMATS)}, "
+                             f"got {archive_format!r}")
                 logging.error(error_msg)
                 raise ConfigurationError(error_msg)
             
-            logging.debug("Directory path types validated")
+            if debug_enabled:
+                logging.debug("Required fields present and field types validated")
             
             # Validate that input directory exists
             input_path = Path(config["input_directory_path"])
-            if not input_path.exists():
+            try:
+                input_stat = os.stat(input_path)
+            except FileNotFoundError:
                 error_msg = f"Input directory does not exist: {input_path}"
                 logging.error(error_msg)
                 raise ConfigurationError(error_msg)
             
-            if not input_path.is_dir():
+            if not stat.S_ISDIR(input_stat.st_mode):
                 error_msg = f"Input path is not a directory: {input_path}"
                 logging.error(error_msg)
                 raise ConfigurationError(error_msg)
             
-            logging.debug(f"Input directory validated: {input_path}")
+            if debug_enabled:
+                logging.debug("Input directory validated: %s", input_path)
             
             # Validate that output directory path is valid
             output_path = Path(config["output_directory_path"])
             try:
-                if output_path.exists() and not output_path.is_dir():
+                try:
+                    output_stat = os.stat(output_path)
+                except FileNotFoundError:
+                    output_stat = None
+                
+                if output_stat is not None and not stat.S_ISDIR(output_stat.st_mode):
                     error_msg = f"Output path exists but is not a directory: {output_path}"
                     logging.error(error_msg)
                     raise ConfigurationError(error_msg)
                 
-                logging.debug(f"Output directory path validated: {output_path}")
+                if debug_enabled:
+                    logging.debug("Output directory path validated: %s", output_path)
                 
             except ConfigurationError:
                 raise
@@ -183,6 +212,11 @@ class ConfigManager:
         """Get the compress configuration value."""
         return self._config["compress"]
     
+    @property
+    def archive_format(self) -> str:
+        """Get the archive format used when compress is enabled."""
+        return self._archive_format
+    
     @property
     def delete_mp4(self) -> bool:
         """Get the delete_mp4 configuration value."""
@@ -191,14 +225,14 @@ class ConfigManager:
     @property
     def input_directory(self) -> Path:
         """Get the input directory path as a Path object."""
-        return Path(self._config["input_directory_path"])
+        return self._input_directory
     
     @property
     def output_directory(self) -> Path:
         """Get the output directory path as a Path object."""
-        return Path(self._config["output_directory_path"])
+        return self._output_directory
     
     @property
-    def thumbnail_video_percentage(self) -> List[int]:
+    def thumbnail_video_percentage(self) -> Tuple[int, ...]:
         """Get the thumbnail video percentage values."""
-        return self._config.get("thumbnail_video_percentage", [30, 50, 70])
+        return self._thumbnail_video_percentage
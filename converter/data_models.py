@@ -1,6 +1,7 @@
 """Data models and dataclasses for the video converter."""
 
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Optional
 
@@ -16,6 +17,41 @@ class ConversionResult:
     error_message: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class VideoPaths:
+    """Output paths for one converted video, computed once per folder."""
+    root: Path      # Output folder for the video
+    video: Path     # video/ subfolder holding the quality folders
+    playlist: Path  # video/playlist.m3u8 (unified master playlist)
+    init: Path      # init.mp4 of the default (first H.264) quality
+    
+    @classmethod
+    def for_output(cls, output_dir: Path, default_quality: str = "720p") -> "VideoPaths":
+        """Build all paths for an output folder in one place."""
+        video = output_dir / "video"
+        return cls(
+            root=output_dir,
+            video=video,
+            playlist=video / "playlist.m3u8",
+            init=video / default_quality / "init.mp4",
+        )
+
+
+@dataclass
+class VideoProbe:
+    """Result of scanning a source folder's video/ subfolder for MP4 files."""
+    status: str  # "valid", "no_mp4" or "multiple_mp4"
+    mp4_path: Optional[Path] = None  # Set only when status is "valid"
+
+
+@dataclass
+class FolderScan:
+    """Everything the workflow needs from one source folder, gathered in one pass."""
+    status: str  # "valid", "no_mp4" or "multiple_mp4"
+    mp4_path: Optional[Path] = None  # Set only when status is "valid"
+    sidecar_files: List[os.DirEntry] = field(default_factory=list)  # Root files to copy
+
+
 @dataclass
 class ValidationResult:
     """Result of HLS output validation."""
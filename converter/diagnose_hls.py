@@ -4,9 +4,28 @@ HLS Output Diagnostic Tool
 Checks HLS output for common issues and provides detailed information.
 """
 
+import os
+import stat
 import sys
 import subprocess
 from pathlib import Path
+from typing import Optional, Tuple
+
+
+def _stat_or_none(path) -> Optional[os.stat_result]:
+    """Return os.stat(path), or None if the path cannot be stat'ed."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _segment_sort_key(name: str) -> Tuple[int, int, str]:
+    """Sort videoN.m4s names by N so video10.m4s follows video9.m4s."""
+    number = name[5:-4]
+    if number.isdigit():
+        return (0, int(number), name)
+    return (1, 0, name)
 
 
 def diagnose_hls_folder(video_folder_path):
@@ -19,11 +38,12 @@ def diagnose_hls_folder(video_folder_path):
     print()
     
     # Check if folder exists
-    if not video_folder.exists():
+    folder_stat = _stat_or_none(video_folder)
+    if folder_stat is None:
         print(f"❌ ERROR: Folder does not exist: {video_folder}")
         return False
     
-    if not video_folder.is_dir():
+    if not stat.S_ISDIR(folder_stat.st_mode):
         print(f"❌ ERROR: Path is not a directory: {video_folder}")
         return False
     
@@ -38,16 +58,17 @@ def diagnose_hls_folder(video_folder_path):
     print("-" * 70)
     
     # Check playlist
-    if playlist_file.exists():
-        size = playlist_file.stat().st_size
-        print(f"✓ video.m3u8 exists ({size} bytes)")
+    playlist_stat = _stat_or_none(playlist_file)
+    if playlist_stat is not None:
+        print(f"✓ video.m3u8 exists ({playlist_stat.st_size} bytes)")
     else:
         print(f"❌ video.m3u8 is MISSING")
         return False
     
     # Check init file
-    if init_file.exists():
-        size = init_file.stat().st_size
+    init_stat = _stat_or_none(init_file)
+    if init_stat is not None:
+        size = init_stat.st_size
         if size > 0:
             print(f"✓ init.mp4 exists ({size} bytes)")
         else:
@@ -59,13 +80,17 @@ def diagnose_hls_folder(video_folder_path):
         return False
     
     # Check for segment files
-    segment_files = sorted(video_folder.glob("video*.m4s"))
+    with os.scandir(video_folder) as it:
+        segment_files = [
+            (entry.name, entry.stat().st_size) for entry in it
+            if entry.name.startswith("video") and entry.name.endswith(".m4s")
+        ]
+    segment_files.sort(key=lambda seg: _segment_sort_key(seg[0]))
     if segment_files:
         print(f"✓ Found {len(segment_files)} segment file(s):")
-        for seg in segment_files:
-            size = seg.stat().st_size
+        for name, size in segment_files:
             status = "✓" if size > 0 else "❌ EMPTY"
-            print(f"  {status} {seg.name} ({size} bytes)")
+            print(f"  {status} {name} ({size} bytes)")
     else:
         print(f"❌ No segment files (video*.m4s) found")
         return False
@@ -1,9 +1,126 @@
 """File system operations for MP4 conversion workflow."""
 
 import logging
+import os
 import shutil
+import stat
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from converter.data_models import FolderScan, VideoProbe
+
+
+def _case_variants(ext: str) -> Tuple[str, ...]:
+    """Return every upper/lower-case spelling of an extension, e.g. '.mp4', '.MP4', '.Mp4'."""
+    return tuple("".join(chars) for chars in product(*({c.lower(), c.upper()} for c in ext)))
+
+
+# All casings of the source video extension, for allocation-free str.endswith checks
+MP4_SUFFIXES = _case_variants(".mp4")
+
+# Maximum number of video/ folder probes remembered by FileProcessor
+PROBE_CACHE_SIZE = 1024
+
+# Maximum number of directory listings remembered by FileProcessor
+DIR_CACHE_SIZE = 256
+
+# Listings of directories modified more recently than this are not cached:
+# coarse-mtime filesystems (FAT has 2 s granularity, SMB/NFS can be similar)
+# may not bump st_mtime_ns for a second change within the same tick
+DIR_CACHE_MIN_AGE_NS = 2_000_000_000
+
+# Worker threads used when copying several sidecar files from one folder
+COPY_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Kernel-side copy primitives, feature-tested once at import
+HAS_COPY_FILE_RANGE = hasattr(os, "copy_file_range")
+HAS_SENDFILE = hasattr(os, "sendfile") and os.name == "posix"
+
+# Buffer size for the userspace fallback copy loop
+COPY_BUFFER_SIZE = 1 << 20
+
+
+def _scan_mp4(video_folder: str, mp4_suffixes: Tuple[str, ...] = MP4_SUFFIXES) -> Tuple[str, Optional[Path]]:
+    """
+    Count MP4 files in a video folder with one os.scandir, stopping at the second.
+    
+    DirEntry.is_file() uses the d_type cached by the directory listing, so
+    no extra stat is issued per entry; only symlinks are stat'ed, and they
+    are followed like Path.is_file() does. The Path is only built for a
+    single hit.
+    
+    Args:
+        video_folder: Path of the video/ subfolder as a string
+        mp4_suffixes: Every casing of the source video extension
+        
+    Returns:
+        Tuple of (status, mp4_path) where status is "valid", "no_mp4" or
+        "multiple_mp4" and mp4_path is set only when status is "valid"
+    """
+    first_mp4 = None
+    mp4_count = 0
+    with os.scandir(video_folder) as it:
+        for entry in it:
+            if entry.name.endswith(mp4_suffixes) and entry.is_file():
+                mp4_count += 1
+                if mp4_count == 1:
+                    first_mp4 = entry.path
+                else:
+                    break
+    
+    if mp4_count == 0:
+        return "no_mp4", None
+    if mp4_count == 1:
+        return "valid", Path(first_mp4)
+    return "multiple_mp4", None
+
+
+def _list_dir(path: str) -> List[os.DirEntry]:
+    """List a directory's entries with a single os.scandir."""
+    with os.scandir(path) as it:
+        return list(it)
+
+
+def _make_scan(video_subdir_name: str = "video", mp4_ext: str = ".mp4",
+               list_dir: Callable[[str], List[os.DirEntry]] = _list_dir) -> Callable[[Path], FolderScan]:
+    """
+    Build a scan function specialized for the expected source folder layout.
+    
+    The returned function lists the folder once to find the video subfolder
+    and the sidecar files, then lists the video subfolder once to count MP4
+    files, stopping at the second match.
+    
+    Args:
+        video_subdir_name: Name of the subfolder holding the source video
+        mp4_ext: Lower-case extension of the source video
+        list_dir: Function returning the entries of a directory
+        
+    Returns:
+        Function mapping a source folder to its FolderScan
+    """
+    mp4_suffixes = _case_variants(mp4_ext)
+    
+    def scan(folder: Path) -> FolderScan:
+        video_entry = None
+        sidecar_files = []
+        for entry in list_dir(os.fspath(folder)):
+            if entry.is_dir():
+                if entry.name == video_subdir_name:
+                    video_entry = entry
+            elif entry.is_file():
+                sidecar_files.append(entry)
+        
+        if video_entry is None:
+            return FolderScan("no_mp4", sidecar_files=sidecar_files)
+        
+        status, mp4_path = _scan_mp4(video_entry.path, mp4_suffixes)
+        return FolderScan(status, mp4_path, sidecar_files)
+    
+    return scan
 
 
 class FileProcessor:
@@ -19,27 +136,147 @@ class FileProcessor:
         """
         self.input_dir = input_dir
         self.output_dir = output_dir
+        # (video folder path, st_mtime_ns) -> VideoProbe
+        self._probe_cache: "OrderedDict[Tuple[str, int], VideoProbe]" = OrderedDict()
+        # (folder path, st_mtime_ns) -> entries, shared by classify and copy scans
+        self._dir_cache: "OrderedDict[Tuple[str, int], List[os.DirEntry]]" = OrderedDict()
+        self._scan = _make_scan(video_subdir_name="video", mp4_ext=".mp4",
+                                list_dir=self._list_dir)
+        # (input dir st_mtime_ns, folders) from the last find_source_folders() scan
+        self._src_cache: Optional[Tuple[int, Tuple[Path, ...]]] = None
+        # Set once output_dir has been created, so later folders only mkdir their leaves
+        self._output_dir_verified = False
+        # Created on first multi-file copy and reused for every folder
+        self._copy_pool: Optional[ThreadPoolExecutor] = None
     
-    def find_source_folders(self) -> List[Path]:
+    def __enter__(self) -> "FileProcessor":
+        """Use FileProcessor as a context manager that releases its caches and pool."""
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Flush caches and shut down the copy pool on leaving the context."""
+        self.close()
+    
+    def close(self) -> None:
+        """Flush the directory cache and shut down the copy thread pool, if started."""
+        self._dir_cache.clear()
+        if self._copy_pool is not None:
+            self._copy_pool.shutdown(wait=True)
+            self._copy_pool = None
+    
+    def find_source_folders(self) -> Iterator[Path]:
         """
         Scan input directory for subdirectories.
         
+        Folders are yielded as the directory is listed; callers that need a
+        list call list() on the result. A completed scan is cached against the
+        input directory's mtime, which only changes when entries are added or
+        removed, so repeated calls cost a single stat when nothing changed.
+        An input directory changed within the last DIR_CACHE_MIN_AGE_NS is
+        scanned without caching, as in _list_dir.
+        
         Returns:
-            List of Path objects representing subdirectories in input directory
+            Iterator of Path objects representing subdirectories in input directory
         """
         try:
-            if not self.input_dir.exists() or not self.input_dir.is_dir():
-                return []
+            mtime_ns = os.stat(self.input_dir).st_mtime_ns
+        except OSError:
+            return iter(())
+        
+        if time.time_ns() - mtime_ns < DIR_CACHE_MIN_AGE_NS:
+            return self.iter_source_folders()
+        
+        if self._src_cache is not None and self._src_cache[0] == mtime_ns:
+            return iter(self._src_cache[1])
+        
+        return self._scan_source_folders(mtime_ns)
+    
+    def _scan_source_folders(self, mtime_ns: int) -> Iterator[Path]:
+        """
+        Yield source folders and cache them once the scan runs to completion.
+        
+        Args:
+            mtime_ns: Input directory mtime the scan result is valid for
             
-            source_folders = [
-                item for item in self.input_dir.iterdir() 
-                if item.is_dir()
-            ]
+        Yields:
+            Path objects representing subdirectories in input directory
+        """
+        folders = []
+        for folder in self.iter_source_folders():
+            folders.append(folder)
+            yield folder
+        self._src_cache = (mtime_ns, tuple(folders))
+    
+    def iter_source_folders(self) -> Iterator[Path]:
+        """
+        Lazily yield subdirectories of the input directory as they are scanned.
+        
+        Lets callers start on the first folder before the whole input
+        directory has been listed.
+        
+        Yields:
+            Path objects representing subdirectories in input directory
+        """
+        try:
+            # A missing or non-directory input dir surfaces as an OSError here
+            with os.scandir(self.input_dir) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        yield Path(entry.path)
+            
+        except OSError:
+            return
+    
+    def _list_dir(self, path: str) -> List[os.DirEntry]:
+        """
+        Return a directory's entries, reusing the last listing if it is unchanged.
+        
+        Listings are keyed on (path, st_mtime_ns); adding, removing or renaming
+        an entry bumps the directory mtime and forces a fresh scandir. A
+        directory changed within the last DIR_CACHE_MIN_AGE_NS is always
+        listed again, since a second change in the same mtime tick would not
+        change the key. Cached entries only vouch for names and types; their
+        stat results may be as old as the listing.
+        
+        Args:
+            path: Directory path as a string
             
-            return source_folders
+        Returns:
+            List of DirEntry objects for the directory
+        """
+        mtime_ns = os.stat(path).st_mtime_ns
+        if time.time_ns() - mtime_ns < DIR_CACHE_MIN_AGE_NS:
+            return _list_dir(path)
+        
+        key = (path, mtime_ns)
+        entries = self._dir_cache.get(key)
+        if entries is not None:
+            self._dir_cache.move_to_end(key)
+            return entries
+        
+        entries = _list_dir(path)
+        self._dir_cache[key] = entries
+        if len(self._dir_cache) > DIR_CACHE_SIZE:
+            self._dir_cache.popitem(last=False)
+        return entries
+    
+    def classify_folder(self, folder: Path) -> FolderScan:
+        """
+        Gather the MP4 status, MP4 path and sidecar files of a folder in one pass.
+        
+        Replaces calling has_single_mp4_file(), get_mp4_file() and
+        copy_non_mp4_files() each with their own directory scan.
+        
+        Args:
+            folder: Path to the source folder
             
-        except Exception:
-            return []
+        Returns:
+            FolderScan for the folder; status is "error" if it cannot be read
+        """
+        try:
+            return self._scan(folder)
+        except OSError:
+            return FolderScan("error")
     
     def has_single_mp4_file(self, folder: Path) -> Tuple[bool, str]:
         """
@@ -61,21 +298,9 @@ class FileProcessor:
             - (False, "multiple_mp4") if video/ subfolder has multiple MP4 files
         """
         try:
-            video_folder = folder / "video"
-            
-            if not video_folder.exists() or not video_folder.is_dir():
-                return False, "no_mp4"
-            
-            mp4_files = list(video_folder.glob("*.mp4"))
-            mp4_count = len(mp4_files)
-            
-            if mp4_count == 0:
-                return False, "no_mp4"
-            elif mp4_count == 1:
-                return True, "valid"
-            else:
-                return False, "multiple_mp4"
-        except Exception:
+            probe = self.probe_video_folder(folder)
+            return probe.status == "valid", probe.status
+        except OSError:
             return False, "error"
     
     def get_mp4_file(self, folder: Path) -> Optional[Path]:
@@ -95,20 +320,54 @@ class FileProcessor:
             Path to the MP4 file, or None if no MP4 file exists or multiple exist
         """
         try:
-            video_folder = folder / "video"
-            
-            if not video_folder.exists() or not video_folder.is_dir():
-                return None
-            
-            mp4_files = list(video_folder.glob("*.mp4"))
-            if len(mp4_files) == 1:
-                return mp4_files[0]
-            else:
-                return None
-        except Exception:
+            return self.probe_video_folder(folder).mp4_path
+        except OSError:
             return None
     
-    def copy_non_video_folder_files(self, source_folder: Path, dest_folder: Path) -> None:
+    def probe_video_folder(self, folder: Path) -> VideoProbe:
+        """
+        Scan a folder's video/ subfolder for MP4 files, stopping at the second match.
+        
+        Results are cached per (video folder, st_mtime_ns) so that
+        has_single_mp4_file() and get_mp4_file() share a single scan. A
+        video folder changed within the last DIR_CACHE_MIN_AGE_NS is scanned
+        without caching, as in _list_dir.
+        
+        Args:
+            folder: Path to the folder containing video/ subfolder
+            
+        Returns:
+            VideoProbe with the folder status and, if valid, the MP4 path
+        """
+        video_folder = os.path.join(folder, "video")
+        
+        try:
+            st = os.stat(video_folder)
+        except OSError:
+            return VideoProbe("no_mp4")
+        
+        if not stat.S_ISDIR(st.st_mode):
+            return VideoProbe("no_mp4")
+        
+        if time.time_ns() - st.st_mtime_ns < DIR_CACHE_MIN_AGE_NS:
+            return VideoProbe(*_scan_mp4(video_folder))
+        
+        key = (video_folder, st.st_mtime_ns)
+        cached = self._probe_cache.get(key)
+        if cached is not None:
+            self._probe_cache.move_to_end(key)
+            return cached
+        
+        probe = VideoProbe(*_scan_mp4(video_folder))
+        
+        self._probe_cache[key] = probe
+        if len(self._probe_cache) > PROBE_CACHE_SIZE:
+            self._probe_cache.popitem(last=False)
+        return probe
+    
+    def copy_non_video_folder_files(self, source_folder: Path, dest_folder: Path,
+                                    sidecar_files: Optional[List[os.DirEntry]] = None,
+                                    preserve_metadata: bool = False) -> int:
         """
         Copy non-video files (data.json, etc.) from source to destination.
         Copies files from the root of source_folder, excluding the video/ subfolder.
@@ -116,27 +375,142 @@ class FileProcessor:
         Args:
             source_folder: Path to the source folder
             dest_folder: Path to the destination folder
+            sidecar_files: Root-level file entries from classify_folder(); when
+                given, the source folder is not listed again
+            preserve_metadata: Also copy access/modification times (default: False)
+            
+        Returns:
+            Number of files copied successfully
         """
         try:
-            if not source_folder.exists() or not dest_folder.exists():
-                return
+            if sidecar_files is not None:
+                files = sidecar_files
+            else:
+                # Collect root-level files; the video/ subfolder is skipped by name first.
+                # A missing source folder raises here; a missing destination fails each copy.
+                files = [
+                    entry for entry in self._list_dir(os.fspath(source_folder))
+                    if not (entry.name.lower() == 'video' and entry.is_dir())
+                    and entry.is_file()
+                ]
             
-            for item in source_folder.iterdir():
-                # Skip the video subfolder
-                if item.is_dir() and item.name.lower() == 'video':
-                    continue
-                
-                if item.is_file():
-                    try:
-                        dest_path = dest_folder / item.name
-                        shutil.copy2(item, dest_path)
-                    except Exception:
-                        pass
+            if not files:
+                return 0
+            
+            # Skip the pool for a single file to avoid the hand-off overhead
+            if len(files) == 1:
+                return 1 if self._copy_file(files[0], dest_folder, preserve_metadata) else 0
+            
+            if self._copy_pool is None:
+                self._copy_pool = ThreadPoolExecutor(max_workers=COPY_WORKERS)
+            futures = [
+                self._copy_pool.submit(self._copy_file, entry, dest_folder, preserve_metadata)
+                for entry in files
+            ]
+            return sum(1 for future in as_completed(futures) if future.result())
                 
-        except Exception:
-            pass
+        except OSError:
+            return 0
+    
+    def _copy_file(self, entry: os.DirEntry, dest_folder: Path,
+                   preserve_metadata: bool = False) -> bool:
+        """
+        Copy a single file's contents into dest_folder, ignoring errors.
+        
+        Sidecar files usually only need their content. When metadata is
+        requested, the source is stat'ed again, since the DirEntry's cached
+        stat may come from a listing made long before the copy.
+        
+        Args:
+            entry: DirEntry of the source file
+            dest_folder: Path to the destination folder
+            preserve_metadata: Also copy access/modification times
+            
+        Returns:
+            True if the file was copied, False otherwise
+        """
+        try:
+            dest = os.path.join(dest_folder, entry.name)
+            self._fast_copy(entry, dest)
+            if preserve_metadata:
+                st = os.stat(entry.path)
+                os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+            return True
+        except OSError:
+            return False
+    
+    def _fast_copy(self, src_entry: os.DirEntry, dest: str) -> None:
+        """
+        Copy file contents using the cheapest primitive the platform offers.
+        
+        Tries os.copy_file_range, then os.sendfile, then a readinto loop over
+        a reused buffer. On Windows shutil.copyfile already uses CopyFileW.
+        The size cached on the DirEntry by the directory scan sizes the kernel
+        copy requests, so the source is not fstat'ed again; copying still runs
+        to EOF in case the file grew after it was scanned.
+        
+        Args:
+            src_entry: DirEntry of the source file
+            dest: Destination file path
+        """
+        if not (HAS_COPY_FILE_RANGE or HAS_SENDFILE):
+            shutil.copyfile(src_entry.path, dest)
+            return
+        
+        size = src_entry.stat().st_size
+        count = max(size, COPY_BUFFER_SIZE)
+        with open(src_entry.path, 'rb') as fsrc, open(dest, 'wb') as fdst:
+            src_fd = fsrc.fileno()
+            dst_fd = fdst.fileno()
+            
+            if HAS_COPY_FILE_RANGE:
+                try:
+                    copied = 0
+                    while True:
+                        n = os.copy_file_range(src_fd, dst_fd, count)
+                        if not n:
+                            break
+                        copied += n
+                    # Some filesystems report EOF straight away instead of
+                    # failing; only trust it if something was copied
+                    if copied or not size:
+                        return
+                except OSError:
+                    pass
+            
+            if HAS_SENDFILE:
+                try:
+                    # Restart from the beginning in case a partial copy happened
+                    offset = 0
+                    os.lseek(dst_fd, 0, os.SEEK_SET)
+                    os.ftruncate(dst_fd, 0)
+                    sent_total = 0
+                    while True:
+                        sent = os.sendfile(dst_fd, src_fd, offset, count)
+                        if sent == 0:
+                            break
+                        offset += sent
+                        sent_total += sent
+                    if sent_total or not size:
+                        return
+                except OSError:
+                    pass
+            
+            # Userspace fallback: restart from the beginning
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            buffer = bytearray(COPY_BUFFER_SIZE)
+            view = memoryview(buffer)
+            while True:
+                n = fsrc.readinto(buffer)
+                if not n:
+                    break
+                fdst.write(view[:n])
     
-    def copy_non_mp4_files(self, source_folder: Path, dest_folder: Path) -> None:
+    def copy_non_mp4_files(self, source_folder: Path, dest_folder: Path,
+                           sidecar_files: Optional[List[os.DirEntry]] = None,
+                           preserve_metadata: bool = False) -> int:
         """
         Copy non-MP4 files from source to destination.
         This is an alias for copy_non_video_folder_files for backward compatibility.
@@ -144,8 +518,15 @@ class FileProcessor:
         Args:
             source_folder: Path to the source folder
             dest_folder: Path to the destination folder
+            sidecar_files: Optional precomputed entries from classify_folder()
+            preserve_metadata: Also copy access/modification times (default: False)
+            
+        Returns:
+            Number of files copied successfully
         """
-        self.copy_non_video_folder_files(source_folder, dest_folder)
+        return self.copy_non_video_folder_files(
+            source_folder, dest_folder, sidecar_files, preserve_metadata
+        )
     
     def create_output_structure(self, folder_name: str) -> Path:
         """
@@ -161,12 +542,20 @@ class FileProcessor:
             output_folder = self.output_dir / folder_name
             video_folder = output_folder / "video"
             
-            # Create directories if they don't exist
-            video_folder.mkdir(parents=True, exist_ok=True)
+            # Create the output root once, then only the two leaf directories
+            if not self._output_dir_verified:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                self._output_dir_verified = True
+            
+            for directory in (output_folder, video_folder):
+                try:
+                    os.mkdir(directory)
+                except FileExistsError:
+                    pass
             
             return output_folder
             
-        except Exception as e:
+        except OSError as e:
             raise IOError(f"Failed to create output structure: {e}")
     
     def get_folder_size(self, folder: Path) -> int:
@@ -180,14 +569,31 @@ class FileProcessor:
             Total size in bytes
         """
         try:
-            total_size = 0
-            for item in folder.rglob("*"):
-                if item.is_file():
-                    total_size += item.stat().st_size
-            return total_size
-        except Exception:
+            return self._scandir_size(str(folder))
+        except OSError:
             return 0
     
+    def _scandir_size(self, path: str) -> int:
+        """
+        Sum file sizes below a directory with an explicit-stack os.scandir walk.
+        
+        Args:
+            path: Directory path as a string
+            
+        Returns:
+            Total size in bytes
+        """
+        total_size = 0
+        stack = [path]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total_size += entry.stat(follow_symlinks=False).st_size
+        return total_size
+    
     def delete_source_folder(self, folder: Path) -> None:
         """
         Safely remove source directory and all its contents.
@@ -196,7 +602,12 @@ class FileProcessor:
             folder: Path to the folder to delete
         """
         try:
-            if folder.exists() and folder.is_dir():
+            # One lstat covers both "exists" and "is a real directory"
+            st = os.lstat(folder)
+            if stat.S_ISDIR(st.st_mode):
                 shutil.rmtree(folder)
-        except Exception:
+        except OSError:
             pass
+        finally:
+            self._src_cache = None
+            self._dir_cache.clear()
@@ -1,24 +1,525 @@
 """HLS encoding with multiple quality levels."""
 
+import asyncio
 import logging
+import os
+import queue
+import shutil
 import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 from converter.video_quality import QualityProfile
 
 
+# Default number of renditions encode_all_parallel() runs at once; x264 stops
+# scaling past a few threads, so several narrower encodes beat one wide one
+DEFAULT_MAX_PARALLEL = max(1, (os.cpu_count() or 1) // 4)
+
+
+# libx264 preset per rendition height; the bottom rungs mostly serve bandwidth
+# probing, so speed matters more there than psy-tuning. Other heights use the
+# encoder's preset, and QualityProfile.preset overrides both
+H264_PRESET_BY_HEIGHT = {360: "ultrafast", 480: "superfast"}
+
+# NVENC equivalents of a profile's libx264 preset override (p1 fastest, p7 best)
+NVENC_PRESET_BY_X264 = {
+    "ultrafast": "p1",
+    "superfast": "p2",
+    "veryfast": "p3",
+    "faster": "p4",
+    "fast": "p4",
+    "medium": "p5",
+    "slow": "p6",
+    "slower": "p7",
+    "veryslow": "p7",
+}
+
+# RAM-backed directory encode_all_parallel() can stage the source in
+TMPFS_DIR = Path("/dev/shm")
+
+# Hardware H.264 encoders, in the order "auto" tries them
+HW_H264_ENCODERS = {
+    "nvenc": "h264_nvenc",
+    "qsv": "h264_qsv",
+    "vaapi": "h264_vaapi",
+    "videotoolbox": "h264_videotoolbox",
+}
+
+# Hardware VP9 encoders, by the same keys; VP9 only moves to the GPU when the
+# H.264 encoder already uses that device
+HW_VP9_ENCODERS = {
+    "qsv": "vp9_qsv",
+    "vaapi": "vp9_vaapi",
+}
+
+# DRM render node h264_vaapi and vp9_vaapi upload frames to
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+# util-linux tool encode_all_parallel() pins each FFmpeg to its CPU set with
+TASKSET = "taskset"
+
+
+@lru_cache(maxsize=1)
+def _available_encoders() -> frozenset:
+    """
+    List the encoders compiled into the local FFmpeg (probed once per process).
+    
+    Returns:
+        Encoder names reported by ffmpeg -encoders, empty if FFmpeg cannot run
+    """
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=30
+        )
+    except Exception:
+        return frozenset()
+    
+    names = set()
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        # Encoder rows look like " V....D libx264   libx264 H.264 / AVC ..."
+        if len(fields) >= 2 and len(fields[0]) == 6 and fields[0][0] in "VAS":
+            names.add(fields[1])
+    return frozenset(names)
+
+
+@lru_cache(maxsize=1)
+def _available_filters() -> frozenset:
+    """
+    List the filters compiled into the local FFmpeg (probed once per process).
+    
+    Returns:
+        Filter names reported by ffmpeg -filters, empty if FFmpeg cannot run
+    """
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-filters"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=30
+        )
+    except Exception:
+        return frozenset()
+    
+    names = set()
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        # Filter rows look like " TSC scale   V->V   Scale the input video size ..."
+        if len(fields) >= 3 and len(fields[0]) == 3 and "->" in fields[2]:
+            names.add(fields[1])
+    return frozenset(names)
+
+
+def _select_h264_encoder(hw_encoder: str) -> str:
+    """
+    Resolve an hw_encoder setting to the FFmpeg H.264 encoder to use.
+    
+    Args:
+        hw_encoder: "none", "auto", or a key of HW_H264_ENCODERS
+        
+    Returns:
+        Encoder name, falling back to libx264 when the request is unavailable
+    """
+    if hw_encoder == "none":
+        return "libx264"
+    if hw_encoder == "auto":
+        candidates = list(HW_H264_ENCODERS.values())
+    elif hw_encoder in HW_H264_ENCODERS:
+        candidates = [HW_H264_ENCODERS[hw_encoder]]
+    else:
+        raise ValueError(f"Unknown hw_encoder: {hw_encoder}")
+    
+    available = _available_encoders()
+    for encoder in candidates:
+        if encoder in available:
+            return encoder
+    
+    if hw_encoder != "auto":
+        logging.warning("%s is not available in this FFmpeg build, using libx264",
+                        candidates[0])
+    return "libx264"
+
+
+def _select_vp9_encoder(h264_encoder: str) -> str:
+    """
+    Pick the VP9 encoder matching the selected H.264 encoder's device.
+    
+    Args:
+        h264_encoder: Encoder returned by _select_h264_encoder()
+        
+    Returns:
+        A hardware VP9 encoder on the same device if FFmpeg has one,
+        otherwise libvpx-vp9
+    """
+    for device, encoder in HW_H264_ENCODERS.items():
+        if encoder == h264_encoder:
+            vp9_encoder = HW_VP9_ENCODERS.get(device)
+            if vp9_encoder and vp9_encoder in _available_encoders():
+                return vp9_encoder
+    return "libvpx-vp9"
+
+
+# Lines of FFmpeg stderr kept for error logs
+STDERR_TAIL_LINES = 50
+
+# Segment file extension per HLS segment container
+SEGMENT_EXTENSIONS = {"fmp4": ".m4s", "mpegts": ".ts"}
+
+# RFC 6381 CODECS values advertised in the master playlist, by output height
+H264_CODECS = {720: "avc1.64001f", 360: "avc1.4d401e"}
+H264_DEFAULT_CODEC = "avc1.4d401f"
+VP9_CODECS = {
+    720: "vp09.00.31.08.00.01.01.01.00",
+    480: "vp09.00.30.08.00.01.01.01.00",
+    360: "vp09.00.21.08.00.01.01.01.00",
+}
+VP9_DEFAULT_CODEC = "vp09.00.30.08.00.01.01.01.00"
+
+# EXT-X-STREAM-INF entry (tag plus URI line); %(audio_codec)s and %(audio)s
+# are filled from STREAM_INF_AUDIO
+STREAM_INF_TEMPLATE = ('#EXT-X-STREAM-INF:BANDWIDTH=%(bandwidth)d,RESOLUTION=%(width)dx%(height)d,'
+                       'CODECS="%(codec)s%(audio_codec)s"%(audio)s\n%(uri)s\n')
+STREAM_INF_AUDIO = {
+    True: {"audio_codec": ",mp4a.40.2", "audio": ',AUDIO="audio"'},
+    False: {"audio_codec": "", "audio": ""},
+}
+
+
+@lru_cache(maxsize=None)
+def _codec_string(codec: str, height: int) -> str:
+    """
+    Resolve the CODECS attribute for a rendition.
+    
+    Args:
+        codec: Profile codec ("h264" or "vp9")
+        height: Output height in pixels
+        
+    Returns:
+        RFC 6381 codec string
+    """
+    if codec == "vp9":
+        return VP9_CODECS.get(height, VP9_DEFAULT_CODEC)
+    return H264_CODECS.get(height, H264_DEFAULT_CODEC)
+
+
+def _rendition_width(height: int, source_size: Optional[Tuple[int, int]] = None) -> int:
+    """
+    Compute the width a rendition is scaled to.
+    
+    Mirrors FFmpeg's scale=-2:H, which keeps the source aspect ratio and
+    rounds to the nearest even width.
+    
+    Args:
+        height: Output height in pixels
+        source_size: Source (width, height), if known
+        
+    Returns:
+        Output width in pixels, assuming 16:9 when the source size is unknown
+    """
+    if source_size and source_size[0] > 0 and source_size[1] > 0:
+        source_width, source_height = source_size
+        return (2 * height * source_width + 2 * source_height) // (4 * source_height) * 2
+    return height * 16 // 9
+
+
+@lru_cache(maxsize=None)
+def _stream_inf(
+    codec: str,
+    width: int,
+    height: int,
+    bandwidth: int,
+    folder_name: str,
+    has_audio: bool
+) -> str:
+    """
+    Format a rendition's EXT-X-STREAM-INF entry (built once per ladder rung).
+    
+    Args:
+        codec: Profile codec ("h264" or "vp9")
+        width: Output width in pixels
+        height: Output height in pixels
+        bandwidth: Peak bandwidth in bits per second
+        folder_name: Rendition folder under video/
+        has_audio: Whether the rendition references the audio group
+        
+    Returns:
+        Tag line plus URI line, newline terminated
+    """
+    return STREAM_INF_TEMPLATE % dict(
+        STREAM_INF_AUDIO[has_audio],
+        bandwidth=bandwidth,
+        width=width,
+        height=height,
+        codec=_codec_string(codec, height),
+        uri=f"{folder_name}/video.m3u8"
+    )
+
+
+def _run_with_stderr_tail(
+    command: List[str],
+    timeout: float,
+    cwd: Optional[Path] = None
+) -> Tuple[int, str]:
+    """
+    Run a command, keeping only the last STDERR_TAIL_LINES lines of its stderr.
+    
+    A reader thread drains stderr into a bounded deque, so memory stays
+    constant however much the process writes.
+    
+    Args:
+        command: Command line to run
+        timeout: Seconds before the process is killed
+        cwd: Working directory for the process
+        
+    Returns:
+        Exit code and the decoded stderr tail
+        
+    Raises:
+        subprocess.TimeoutExpired: If the process outlives timeout (it is killed)
+    """
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=str(cwd) if cwd else None
+    )
+    tail, reader = _tail_stderr(process)
+    
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        reader.join()
+        process.stderr.close()
+    
+    return process.returncode, b"".join(tail).decode("utf-8", "replace")
+
+
+def _tail_stderr(process: subprocess.Popen) -> Tuple[deque, threading.Thread]:
+    """
+    Drain a process's piped stderr into a bounded deque on a reader thread.
+    
+    The caller joins the thread once the process has exited and then
+    closes process.stderr.
+    
+    Args:
+        process: Process started with stderr=subprocess.PIPE
+        
+    Returns:
+        The deque holding the last STDERR_TAIL_LINES lines, and the reader
+    """
+    tail = deque(maxlen=STDERR_TAIL_LINES)
+    reader = threading.Thread(
+        target=lambda: tail.extend(iter(process.stderr.readline, b"")),
+        daemon=True
+    )
+    reader.start()
+    return tail, reader
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """
+    Replace a file's contents in one step so readers never see a partial file.
+    
+    Args:
+        path: File to write
+        data: Complete new contents
+    """
+    temp_path = path.with_name(path.name + ".tmp")
+    fd = os.open(str(temp_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(str(temp_path), str(path))
+    except OSError:
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def _cpu_sets(count: int) -> List[List[int]]:
+    """
+    Split the CPUs this process may run on into disjoint, contiguous sets.
+    
+    Args:
+        count: Number of sets wanted
+        
+    Returns:
+        Up to count non-empty lists of CPU ids
+    """
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = list(range(os.cpu_count() or 1))
+    
+    count = max(1, min(count, len(cpus)))
+    size, extra = divmod(len(cpus), count)
+    sets = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(cpus[start:end])
+        start = end
+    return sets
+
+
+def _cpu_set_queue(count: int) -> "queue.Queue[List[int]]":
+    """
+    Build a queue holding the core sets of _cpu_sets(count).
+    
+    Args:
+        count: Number of sets wanted
+        
+    Returns:
+        Queue of idle core sets for _run_on_cpu_set
+    """
+    free_cpus = queue.Queue()
+    for cpus in _cpu_sets(count):
+        free_cpus.put(cpus)
+    return free_cpus
+
+
+def _run_on_cpu_set(
+    job: Callable[[Optional[int], Optional[List[int]]], bool],
+    threads: Optional[int],
+    free_cpus: "Optional[queue.Queue[List[int]]]" = None
+) -> bool:
+    """
+    Run an encode, pinned to a core set borrowed from free_cpus when given.
+    
+    A running encode holds one core set and hands it back when done.
+    
+    Args:
+        job: Encode to run, called with a thread limit and CPU ids
+        threads: Thread limit when running unpinned
+        free_cpus: Idle core sets (default: run unpinned)
+        
+    Returns:
+        The job's result
+    """
+    if free_cpus is None:
+        return job(threads, None)
+    cpus = free_cpus.get()
+    try:
+        return job(len(cpus), cpus)
+    finally:
+        free_cpus.put(cpus)
+
+
+def _dir_names(directory: Path) -> frozenset:
+    """
+    Read a directory's entry names in one call.
+    
+    Args:
+        directory: Directory to list
+        
+    Returns:
+        Entry names, empty if the directory cannot be read
+    """
+    try:
+        return frozenset(os.listdir(directory))
+    except OSError:
+        return frozenset()
+
+
 class HLSEncoder:
     """Encodes video to HLS format with multiple quality levels."""
     
-    def __init__(self, segment_duration: int = 6):
+    def __init__(
+        self,
+        segment_duration: int = 6,
+        pipe_fanout: bool = False,
+        max_parallel: int = DEFAULT_MAX_PARALLEL,
+        preset: str = "veryfast",
+        tune: Optional[str] = None,
+        hw_encoder: str = "none",
+        stage_input: bool = False,
+        cascade: bool = False,
+        single_file: bool = False,
+        container: str = "fmp4",
+        scaler: str = "scale",
+        fps: float = 0.0,
+        pin_cpus: bool = False
+    ):
         """
         Initialize HLSEncoder.
         
         Args:
             segment_duration: Duration of each HLS segment in seconds
+            pipe_fanout: In encode_all(), decode once and pipe raw YUV to one
+                encoder process per rendition (POSIX only)
+            max_parallel: Renditions encoded at once by encode_all_parallel()
+            preset: libx264 preset; "veryfast" trades little quality at a
+                fixed streaming bitrate for a several times shorter encode than
+                the "medium" default. Low renditions use H264_PRESET_BY_HEIGHT
+            tune: Optional libx264 -tune (e.g. "film", "animation")
+            hw_encoder: H.264 hardware encoder: "none" (libx264), "auto", or
+                one of "nvenc", "qsv", "vaapi", "videotoolbox"; falls back to
+                libx264 when the FFmpeg build lacks it. VP9 uses vp9_qsv or
+                vp9_vaapi when the chosen device has one, else libvpx-vp9
+            stage_input: In encode_all_parallel(), copy the source to tmpfs
+                first so the per-rendition reads come from RAM (Linux only)
+            cascade: In encode_all_parallel(), write a near-lossless
+                mezzanine at the top rendition's height alongside it and scale
+                the lower renditions from that instead of the full-size source
+            single_file: Write each rendition as one .m4s addressed with
+                EXT-X-BYTERANGE instead of one file per segment
+            container: H.264 segment container, "fmp4" or "mpegts"; MPEG-TS
+                segments need no init.mp4. VP9 and audio always use fMP4
+            scaler: "scale" (libswscale) or "zscale" (libzimg, Lanczos);
+                zscale falls back to scale when FFmpeg lacks libzimg
+            fps: Source frame rate; when known the GOP is capped at one
+                segment's worth of frames
+            pin_cpus: In encode_all_parallel(), pin each concurrent video
+                encode to its own disjoint set of cores with taskset (Linux)
         """
         self.segment_duration = segment_duration
+        self.fps = fps
+        self._codec_args_cache: Dict[tuple, List[str]] = {}
+        self.pipe_fanout = pipe_fanout
+        self.max_parallel = max(1, max_parallel)
+        self.preset = preset
+        self.tune = tune
+        self.h264_encoder = _select_h264_encoder(hw_encoder)
+        self.vp9_encoder = _select_vp9_encoder(self.h264_encoder)
+        self.stage_input_enabled = stage_input
+        self.cascade = cascade
+        if container not in SEGMENT_EXTENSIONS:
+            raise ValueError(f"Unknown container: {container}")
+        self.container = container
+        self.single_file = single_file
+        self.pin_cpus = pin_cpus and shutil.which(TASKSET) is not None
+        if pin_cpus and not self.pin_cpus:
+            logging.warning("%s is not available, running encodes unpinned", TASKSET)
+        self.scaler = "scale"
+        if scaler == "zscale":
+            if "zscale" in _available_filters():
+                self.scaler = "zscale"
+            else:
+                logging.warning("zscale is not available in this FFmpeg build, using scale")
+        elif scaler != "scale":
+            raise ValueError(f"Unknown scaler: {scaler}")
     
     def encode_audio(
         self,
@@ -38,85 +539,20 @@ class HLSEncoder:
             True if encoding succeeded, False otherwise
         """
         try:
-            # Create audio folder
-            audio_dir = output_dir.parent / "audio"
+            # Create audio folder (absolute once, reused for cwd and output checks)
+            audio_dir = (output_dir.parent / "audio").absolute()
             audio_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Build FFmpeg command for audio-only HLS
-            # Use relative paths for init and segments so they work in the playlist
-            command = [
-                "ffmpeg",
-                "-y",
-                "-i", str(input_video.absolute()),
-                # Audio only - no video
-                "-vn",
-                # Audio encoding
-                "-c:a", "aac",
-                "-b:a", audio_bitrate,
-                "-ac", "2",
-                # HLS settings
-                "-f", "hls",
-                "-hls_time", str(self.segment_duration),
-                "-hls_playlist_type", "vod",
-                "-hls_segment_type", "fmp4",
-                "-hls_fmp4_init_filename", "init.mp4",
-                "-hls_segment_filename", "audio%d.m4s",
-                "-hls_flags", "independent_segments",
-                "-start_number", "1",
-                "aac.m3u8"
-            ]
+            input_abs = input_video.absolute()
             
             # Execute FFmpeg from the audio directory so files are created there
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=3600,
-                cwd=str(audio_dir.absolute())
+            returncode, stderr_tail = _run_with_stderr_tail(
+                self._audio_command(input_abs, audio_bitrate), timeout=3600, cwd=audio_dir
             )
             
-            if result.returncode == 0:
-                # Verify playlist exists
-                playlist = audio_dir / "aac.m3u8"
-                init_file = audio_dir / "init.mp4"
-                
-                if not playlist.exists():
-                    return False
-                
-                # Create init file manually if needed
-                if not init_file.exists():
-                    try:
-                        init_command = [
-                            "ffmpeg",
-                            "-y",
-                            "-i", str(input_video.absolute()),
-                            "-vn",
-                            "-c:a", "aac",
-                            "-b:a", audio_bitrate,
-                            "-ac", "2",
-                            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
-                            "-f", "mp4",
-                            "-t", "0.001",
-                            str(init_file.absolute())
-                        ]
-                        
-                        init_result = subprocess.run(
-                            init_command,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True,
-                            timeout=60
-                        )
-                        
-                        if init_result.returncode != 0 or not init_file.exists():
-                            return False
-                    except Exception:
-                        return False
-                
-                return True
-            else:
+            if returncode != 0:
+                logging.error("Audio encode failed: %s", stderr_tail)
                 return False
+            return self._verify_audio_output(audio_dir)
                 
         except subprocess.TimeoutExpired:
             return False
@@ -127,7 +563,9 @@ class HLSEncoder:
         self,
         input_video: Path,
         output_dir: Path,
-        profile: QualityProfile
+        profile: QualityProfile,
+        threads: Optional[int] = None,
+        cpus: Optional[List[int]] = None
     ) -> bool:
         """
         Encode video to a specific quality level (video only, no audio).
@@ -137,154 +575,1092 @@ class HLSEncoder:
             input_video: Path to source video file
             output_dir: Path to output directory (video/)
             profile: QualityProfile to encode
+            threads: Encoder thread limit (default: let FFmpeg decide)
+            cpus: CPU ids to pin FFmpeg to with taskset (default: unpinned)
             
         Returns:
             True if encoding succeeded, False otherwise
         """
         try:
-            # Create quality-specific folder
-            quality_dir = output_dir / profile.folder_name
+            # Create quality-specific folder (absolute once, reused for cwd and output checks)
+            quality_dir = (output_dir / profile.folder_name).absolute()
             quality_dir.mkdir(parents=True, exist_ok=True)
+            input_abs = input_video.absolute()
             
-            # Build FFmpeg command based on codec
-            if profile.codec == "vp9":
-                # VP9 encoding
-                command = [
-                    "ffmpeg",
-                    "-y",
-                    "-i", str(input_video.absolute()),
-                    # Video only - no audio
-                    "-an",
-                    # VP9 encoding
-                    "-c:v", "libvpx-vp9",
-                    "-b:v", profile.video_bitrate,
-                    "-maxrate", profile.video_bitrate,
-                    "-bufsize", str(int(profile.video_bitrate.rstrip('k')) * 2) + "k",
-                    "-vf", f"scale=-2:{profile.height}",
-                    "-row-mt", "1",  # Enable row-based multithreading for VP9
-                    "-cpu-used", "2",  # Speed vs quality tradeoff (0-5, higher is faster)
-                    # HLS settings
-                    "-f", "hls",
-                    "-hls_time", str(self.segment_duration),
-                    "-hls_playlist_type", "vod",
-                    "-hls_segment_type", "fmp4",
-                    "-hls_fmp4_init_filename", "init.mp4",
-                    "-hls_segment_filename", "video%d.m4s",
-                    "-hls_flags", "independent_segments",
-                    "-start_number", "1",
-                    "video.m3u8"
-                ]
-            else:
-                # H.264 encoding (default)
-                command = [
-                    "ffmpeg",
-                    "-y",
-                    "-i", str(input_video.absolute()),
-                    # Video only - no audio
-                    "-an",
-                    # Video encoding
-                    "-c:v", "libx264",
-                    "-b:v", profile.video_bitrate,
-                    "-maxrate", profile.video_bitrate,
-                    "-bufsize", str(int(profile.video_bitrate.rstrip('k')) * 2) + "k",
-                    "-vf", f"scale=-2:{profile.height}",
-                    "-profile:v", "main",
-                    "-level", "4.0",
-                    # HLS settings
-                    "-f", "hls",
-                    "-hls_time", str(self.segment_duration),
-                    "-hls_playlist_type", "vod",
-                    "-hls_segment_type", "fmp4",
-                    "-hls_fmp4_init_filename", "init.mp4",
-                    "-hls_segment_filename", "video%d.m4s",
-                    "-hls_flags", "independent_segments",
-                    "-start_number", "1",
-                    "video.m3u8"
-                ]
+            command = self._quality_command(input_abs, profile, threads)
+            if cpus:
+                command = [TASKSET, "-c", ",".join(map(str, cpus))] + command
             
             # Execute FFmpeg from the quality directory so files are created there
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=3600,
-                cwd=str(quality_dir.absolute())
-            )
+            returncode, stderr_tail = _run_with_stderr_tail(command, timeout=3600, cwd=quality_dir)
             
-            if result.returncode == 0:
-                # Verify output files exist
-                playlist = quality_dir / "video.m3u8"
-                init_file = quality_dir / "init.mp4"
-                
-                if not playlist.exists():
-                    return False
-                
-                # If init file doesn't exist, create it manually from the encoded video
-                if not init_file.exists():
-                    try:
-                        # Create init segment with just the moov atom (video only)
-                        if profile.codec == "vp9":
-                            init_command = [
-                                "ffmpeg",
-                                "-y",
-                                "-i", str(input_video.absolute()),
-                                "-an",
-                                "-c:v", "libvpx-vp9",
-                                "-b:v", profile.video_bitrate,
-                                "-vf", f"scale=-2:{profile.height}",
-                                "-row-mt", "1",
-                                "-cpu-used", "2",
-                                "-movflags", "frag_keyframe+empty_moov+default_base_moof",
-                                "-f", "mp4",
-                                "-t", "0.001",
-                                str(init_file.absolute())
-                            ]
-                        else:
-                            init_command = [
-                                "ffmpeg",
-                                "-y",
-                                "-i", str(input_video.absolute()),
-                                "-an",
-                                "-c:v", "libx264",
-                                "-b:v", profile.video_bitrate,
-                                "-vf", f"scale=-2:{profile.height}",
-                                "-profile:v", "main",
-                                "-level", "4.0",
-                                "-movflags", "frag_keyframe+empty_moov+default_base_moof",
-                                "-f", "mp4",
-                                "-t", "0.001",
-                                str(init_file.absolute())
-                            ]
-                        
-                        init_result = subprocess.run(
-                            init_command,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True,
-                            timeout=60
-                        )
-                        
-                        if init_result.returncode != 0 or not init_file.exists():
-                            return False
-                    except Exception:
-                        return False
-                
-                return True
-            else:
+            if returncode != 0:
+                logging.error("%s encode failed: %s", profile.folder_name, stderr_tail)
                 return False
+            return self._verify_quality_output(quality_dir, profile)
                 
         except subprocess.TimeoutExpired:
             return False
         except Exception:
             return False
     
+    async def encode_audio_async(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        audio_bitrate: str = "128k"
+    ) -> bool:
+        """
+        Coroutine version of encode_audio() that awaits FFmpeg instead of blocking.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            
+        Returns:
+            True if encoding succeeded, False otherwise
+        """
+        try:
+            audio_dir = (output_dir.parent / "audio").absolute()
+            audio_dir.mkdir(parents=True, exist_ok=True)
+            input_abs = input_video.absolute()
+            
+            command = self._audio_command(input_abs, audio_bitrate)
+            returncode, stderr_tail = await self._run_async(command, audio_dir)
+            if returncode != 0:
+                logging.error("Audio encode failed: %s", stderr_tail)
+                return False
+            return self._verify_audio_output(audio_dir)
+        except Exception:
+            return False
+    
+    async def encode_quality_async(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profile: QualityProfile,
+        threads: Optional[int] = None
+    ) -> bool:
+        """
+        Coroutine version of encode_quality() that awaits FFmpeg instead of blocking.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profile: QualityProfile to encode
+            threads: Encoder thread limit (default: let FFmpeg decide)
+            
+        Returns:
+            True if encoding succeeded, False otherwise
+        """
+        try:
+            quality_dir = (output_dir / profile.folder_name).absolute()
+            quality_dir.mkdir(parents=True, exist_ok=True)
+            input_abs = input_video.absolute()
+            
+            command = self._quality_command(input_abs, profile, threads)
+            returncode, stderr_tail = await self._run_async(command, quality_dir)
+            if returncode != 0:
+                logging.error("%s encode failed: %s", profile.folder_name, stderr_tail)
+                return False
+            return self._verify_quality_output(quality_dir, profile)
+        except Exception:
+            return False
+    
+    async def encode_all_async(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profiles: List[QualityProfile],
+        audio_bitrate: str = "128k",
+        include_audio: bool = True
+    ) -> Dict[str, bool]:
+        """
+        Run the audio and per-profile encodes as concurrent FFmpeg processes.
+        
+        At most max_parallel processes run at once, each video encode limited
+        to its share of the CPU cores with -threads; the audio encode overlaps
+        the video encodes instead of adding its own startup and runtime.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profiles: QualityProfiles to encode (H.264 and/or VP9)
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            include_audio: Also encode the audio rendition to audio/
+            
+        Returns:
+            Dict mapping each profile's folder_name (and "audio" when
+            include_audio is set) to whether its output was produced
+        """
+        workers = min(self.max_parallel, len(profiles) + int(include_audio)) or 1
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # Created per call: before Python 3.10 a Semaphore binds to the running loop
+        semaphore = asyncio.Semaphore(workers)
+        
+        async def bounded(job):
+            async with semaphore:
+                return await job
+        
+        names = []
+        jobs = []
+        # Audio first, so it takes a slot right away instead of queueing
+        # behind the video encodes
+        if include_audio:
+            names.append("audio")
+            jobs.append(self.encode_audio_async(input_video, output_dir, audio_bitrate))
+        names += [profile.folder_name for profile in profiles]
+        jobs += [
+            self.encode_quality_async(input_video, output_dir, profile, threads)
+            for profile in profiles
+        ]
+        
+        return dict(zip(names, await asyncio.gather(*(bounded(job) for job in jobs))))
+    
+    async def _run_async(self, command: List[str], cwd: Path, timeout: int = 3600) -> Tuple[int, str]:
+        """
+        Run an FFmpeg command without blocking the event loop.
+        
+        The commands run with -loglevel error, so stderr stays small enough to
+        collect whole; only its last STDERR_TAIL_LINES lines are returned.
+        
+        Args:
+            command: FFmpeg command line
+            cwd: Working directory for the process
+            timeout: Seconds before the process is killed
+            
+        Returns:
+            The process exit code (-1 if it timed out) and the decoded stderr tail
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            cwd=str(cwd)
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return -1, f"timed out after {timeout}s"
+        
+        tail = stderr.splitlines(keepends=True)[-STDERR_TAIL_LINES:]
+        return process.returncode, b"".join(tail).decode("utf-8", "replace")
+    
+    def _audio_command(self, input_abs: Path, audio_bitrate: str) -> List[str]:
+        """
+        Build the audio-only HLS command, run from inside audio/.
+        
+        Args:
+            input_abs: Absolute path of the source video
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            
+        Returns:
+            FFmpeg command line
+        """
+        # Use relative paths for init and segments so they work in the playlist
+        command = [
+            "ffmpeg",
+            "-y",
+            # Errors only: the stderr tail is read line by line
+            "-nostats",
+            "-loglevel", "error",
+            "-i", str(input_abs),
+            # Audio only - no video
+            "-vn",
+            # Audio encoding
+            "-c:a", "aac",
+            "-b:a", audio_bitrate,
+            "-ac", "2",
+            # HLS settings
+            "-f", "hls",
+            "-hls_time", str(self.segment_duration),
+            "-hls_playlist_type", "vod",
+        ]
+        command += self._segment_args("audio")
+        command.append("aac.m3u8")
+        return command
+    
+    def _quality_command(
+        self,
+        input_abs: Path,
+        profile: QualityProfile,
+        threads: Optional[int] = None
+    ) -> List[str]:
+        """
+        Build the video-only HLS command for one profile, run from inside its folder.
+        
+        Args:
+            input_abs: Absolute path of the source video
+            profile: QualityProfile to encode (H.264 or VP9, chosen by profile.codec)
+            threads: Encoder thread limit (default: let FFmpeg decide)
+            
+        Returns:
+            FFmpeg command line
+        """
+        # NVENC renditions decode and scale on the GPU; frames never visit system memory
+        gpu_frames = self.h264_encoder == "h264_nvenc" and profile.codec == "h264"
+        command = ["ffmpeg", "-y", "-nostats", "-loglevel", "error"]
+        command += self._hw_device_args(gpu_frames)
+        command += [
+            "-i", str(input_abs),
+            # Video only - no audio
+            "-an",
+        ]
+        command += self._video_codec_args(profile, threads)
+        command += [
+            "-vf", self._scale_filter(profile.height, profile, gpu_frames),
+            # HLS settings
+            "-f", "hls",
+            "-hls_time", str(self.segment_duration),
+            "-hls_playlist_type", "vod",
+        ]
+        command += self._segment_args("video", container=self.segment_container(profile))
+        command.append("video.m3u8")
+        return command
+    
+    def _verify_audio_output(self, audio_dir: Path) -> bool:
+        """
+        Check the audio playlist and its init segment were written.
+        
+        Args:
+            audio_dir: Absolute path of the audio folder
+            
+        Returns:
+            True if the playlist and init segment are present
+        """
+        # One directory read instead of a stat per file
+        files = _dir_names(audio_dir)
+        
+        if "aac.m3u8" not in files:
+            return False
+        
+        if "init.mp4" not in files:
+            logging.error("FFmpeg wrote %s/aac.m3u8 but no init.mp4", audio_dir)
+            return False
+        
+        return True
+    
+    def _verify_quality_output(self, quality_dir: Path, profile: QualityProfile) -> bool:
+        """
+        Check a rendition's playlist and (for fMP4) its init segment were written.
+        
+        Args:
+            quality_dir: Absolute path of the quality folder
+            profile: QualityProfile that was encoded
+            
+        Returns:
+            True if the playlist and init segment are present
+        """
+        # One directory read instead of a stat per file
+        files = _dir_names(quality_dir)
+        
+        if "video.m3u8" not in files:
+            return False
+        
+        if self._needs_init(profile, files):
+            logging.error("FFmpeg wrote %s/video.m3u8 but no init.mp4", quality_dir)
+            return False
+        
+        return True
+    
+    def _needs_init(self, profile: QualityProfile, files: frozenset) -> bool:
+        """
+        Check whether a rendition's folder lacks the init.mp4 it should have.
+        
+        Args:
+            profile: QualityProfile that was encoded
+            files: Names in the rendition's folder
+            
+        Returns:
+            True if the rendition is fMP4 and init.mp4 is missing
+        """
+        return self.segment_container(profile) == "fmp4" and "init.mp4" not in files
+    
+    def encode_all(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profiles: List[QualityProfile],
+        audio_bitrate: str = "128k",
+        include_audio: bool = True
+    ) -> Dict[str, bool]:
+        """
+        Encode audio and every quality level with a single FFmpeg invocation.
+        
+        The source is decoded once and split into one scaler per profile, so
+        an N-rendition ladder no longer pays for N+1 decodes. Output layout
+        matches encode_audio() and encode_quality().
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profiles: QualityProfiles to encode (H.264 and/or VP9)
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            include_audio: Also encode the audio rendition to audio/
+            
+        Returns:
+            Dict mapping each profile's folder_name (and "audio" when
+            include_audio is set) to whether its output was produced
+        """
+        results = {profile.folder_name: False for profile in profiles}
+        if include_audio:
+            results["audio"] = False
+        
+        if not profiles:
+            return results
+        
+        if self.pipe_fanout and os.name == "posix":
+            return self._encode_all_piped(input_video, output_dir, profiles, audio_bitrate, results)
+        
+        try:
+            # Resolve once; every output path below is joined onto these
+            input_video = input_video.absolute()
+            output_dir = output_dir.absolute()
+            command = [
+                "ffmpeg",
+                "-y",
+                "-nostats",
+                "-loglevel", "error",
+            ] + self._hw_device_args() + [
+                "-i", str(input_video),
+                "-filter_complex", self._split_scale_filter(profiles, hw_scale=True),
+            ]
+            
+            for i, profile in enumerate(profiles):
+                quality_dir = output_dir / profile.folder_name
+                quality_dir.mkdir(parents=True, exist_ok=True)
+                command += ["-map", f"[v{i}]"]
+                command += self._video_codec_args(profile)
+                command += self._video_hls_args(quality_dir, profile)
+            
+            if include_audio:
+                command += self._audio_output_args(output_dir, audio_bitrate)
+            
+            returncode, stderr_tail = _run_with_stderr_tail(command, timeout=3600 * len(results))
+            
+            if returncode != 0:
+                logging.error("Single-pass encode failed: %s", stderr_tail)
+                return results
+            
+            return self._collect_results(output_dir, profiles, results)
+            
+        except subprocess.TimeoutExpired:
+            return results
+        except Exception:
+            return results
+    
+    def encode_all_parallel(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profiles: List[QualityProfile],
+        audio_bitrate: str = "128k",
+        include_audio: bool = True
+    ) -> Dict[str, bool]:
+        """
+        Encode audio and each quality level as separate FFmpeg runs, max_parallel at a time.
+        
+        Each video encode is limited to its share of the CPU cores with
+        -threads so concurrent runs do not oversubscribe the machine. With
+        pin_cpus, each running encode also owns a disjoint core set, so the
+        scheduler cannot bounce its threads across the others' caches.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profiles: QualityProfiles to encode (H.264 and/or VP9)
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            include_audio: Also encode the audio rendition to audio/
+            
+        Returns:
+            Dict mapping each profile's folder_name (and "audio" when
+            include_audio is set) to whether its output was produced
+        """
+        workers = min(self.max_parallel, len(profiles) + int(include_audio)) or 1
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        source = self.stage_input(input_video) if self.stage_input_enabled else input_video
+        mezzanine = None
+        results = {}
+        
+        try:
+            # Threads are enough here: each worker just waits on its FFmpeg process
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {}
+                if include_audio:
+                    futures["audio"] = pool.submit(
+                        self.encode_audio, source, output_dir, audio_bitrate
+                    )
+                
+                remaining = profiles
+                top_height = max((profile.height for profile in profiles), default=0)
+                if self.cascade and len(profiles) > 1:
+                    # The top rendition runs first and writes the mezzanine the rest read.
+                    # Nothing else can start until it finishes, so it gets every core
+                    top = max(profiles, key=lambda profile: profile.height)
+                    results[top.folder_name], mezzanine = self._encode_top_and_mezzanine(
+                        source, output_dir, top
+                    )
+                    remaining = [profile for profile in profiles if profile is not top]
+                
+                free_cpus = _cpu_set_queue(min(workers, len(remaining))) if self.pin_cpus else None
+                
+                def encode(profile):
+                    profile_source = mezzanine if mezzanine and profile.height < top_height else source
+                    job = partial(self.encode_quality, profile_source, output_dir, profile)
+                    return _run_on_cpu_set(job, threads, free_cpus)
+                
+                for profile in remaining:
+                    futures[profile.folder_name] = pool.submit(encode, profile)
+                results.update((name, future.result()) for name, future in futures.items())
+            
+            order = [profile.folder_name for profile in profiles] + (["audio"] if include_audio else [])
+            return {name: results[name] for name in order}
+        finally:
+            if mezzanine:
+                try:
+                    mezzanine.unlink()
+                except OSError:
+                    pass
+            self.cleanup_input(source, input_video)
+    
+    def _encode_top_and_mezzanine(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profile: QualityProfile,
+        threads: Optional[int] = None
+    ) -> Tuple[bool, Optional[Path]]:
+        """
+        Encode the top rendition and, from the same decode, a mezzanine for the rest.
+        
+        The mezzanine is a near-lossless, video-only intermediate at the top
+        rendition's height. Lower renditions decoded from it read far fewer
+        pixels than from a larger source, at the cost of a marginal
+        second-generation quality loss.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profile: Highest QualityProfile of the ladder
+            threads: Encoder thread limit for the rendition (default: let FFmpeg decide)
+            
+        Returns:
+            Whether the rendition was produced, and the mezzanine path (None
+            if it could not be produced)
+        """
+        if self.h264_encoder == "h264_nvenc" and profile.codec == "h264":
+            # CUDA frames cannot feed the CPU mezzanine encoder; use two runs
+            return (
+                self.encode_quality(input_video, output_dir, profile, threads),
+                self._encode_mezzanine(input_video, output_dir, profile.height)
+            )
+        
+        quality_dir = (output_dir / profile.folder_name).absolute()
+        mezzanine = (output_dir / f"_mezzanine_{profile.height}p.mkv").absolute()
+        success = False
+        
+        try:
+            quality_dir.mkdir(parents=True, exist_ok=True)
+            input_abs = input_video.absolute()
+            command = self._quality_command(input_abs, profile, threads)
+            command += ["-map", "0:v:0"] + self._mezzanine_args(profile.height, mezzanine)
+            
+            returncode, stderr_tail = _run_with_stderr_tail(command, timeout=3600, cwd=quality_dir)
+            success = returncode == 0 and self._verify_quality_output(quality_dir, profile)
+            if returncode == 0 and mezzanine.exists():
+                return success, mezzanine
+            logging.error("%s with mezzanine failed: %s", profile.folder_name, stderr_tail)
+        except Exception as e:
+            logging.error("%s with mezzanine failed: %s", profile.folder_name, e)
+        
+        logging.warning("Mezzanine encode failed, scaling every rendition from the source")
+        if mezzanine.exists():
+            mezzanine.unlink()
+        if not success:
+            success = self.encode_quality(input_video, output_dir, profile, threads)
+        return success, None
+    
+    def _encode_mezzanine(self, input_video: Path, output_dir: Path, height: int) -> Optional[Path]:
+        """
+        Encode the cascade mezzanine on its own (see _encode_top_and_mezzanine).
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            height: Height of the top rendition
+            
+        Returns:
+            Path of the mezzanine file, or None if it could not be produced
+        """
+        mezzanine = (output_dir / f"_mezzanine_{height}p.mkv").absolute()
+        command = [
+            "ffmpeg",
+            "-y",
+            "-nostats",
+            "-loglevel", "error",
+            "-i", str(input_video.absolute()),
+        ]
+        command += self._mezzanine_args(height, mezzanine)
+        
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            returncode, stderr_tail = _run_with_stderr_tail(command, timeout=3600)
+            if returncode == 0 and mezzanine.exists():
+                return mezzanine
+            logging.error("Mezzanine encode at %sp failed: %s", height, stderr_tail)
+        except Exception as e:
+            logging.error("Mezzanine encode at %sp failed: %s", height, e)
+        
+        logging.warning("Mezzanine encode failed, scaling every rendition from the source")
+        if mezzanine.exists():
+            mezzanine.unlink()
+        return None
+    
+    def _mezzanine_args(self, height: int, mezzanine: Path) -> List[str]:
+        """
+        Build the output arguments for a cascade mezzanine.
+        
+        Args:
+            height: Height of the top rendition
+            mezzanine: Absolute path of the .mkv to write
+            
+        Returns:
+            FFmpeg output arguments ending with the mezzanine path
+        """
+        return [
+            "-an",
+            "-vf", self._scale_filter(height),
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            "-crf", "15",
+            str(mezzanine)
+        ]
+    
+    def stage_input(self, input_video: Path) -> Path:
+        """
+        Copy the source video to tmpfs so repeated reads are served from RAM.
+        
+        The caller owns the copy and must delete it. If tmpfs is missing or
+        too small, or the copy fails, the original path is returned instead.
+        
+        Args:
+            input_video: Path to source video file
+            
+        Returns:
+            Path of the staged copy, or input_video if it was not staged
+        """
+        try:
+            if not TMPFS_DIR.is_dir():
+                return input_video
+            
+            size = input_video.stat().st_size
+            # Leave headroom so staging cannot exhaust the machine's memory
+            if shutil.disk_usage(str(TMPFS_DIR)).free < size * 2:
+                logging.info("Not staging %s: not enough space on %s", input_video.name, TMPFS_DIR)
+                return input_video
+            
+            staged = TMPFS_DIR / f"hls_{uuid.uuid4().hex}{input_video.suffix}"
+            try:
+                shutil.copyfile(str(input_video), str(staged))
+            except OSError:
+                if staged.exists():
+                    staged.unlink()
+                raise
+            return staged
+        except OSError as e:
+            logging.warning("Could not stage %s on %s: %s", input_video.name, TMPFS_DIR, e)
+            return input_video
+    
+    def cleanup_input(self, staged: Path, input_video: Path) -> None:
+        """
+        Delete a copy made by stage_input(), leaving the original untouched.
+        
+        Args:
+            staged: Path returned by stage_input()
+            input_video: Path that was passed to stage_input()
+        """
+        if staged == input_video:
+            return
+        try:
+            staged.unlink()
+        except OSError as e:
+            logging.warning("Could not remove staged input %s: %s", staged, e)
+    
+    def _encode_all_piped(
+        self,
+        input_video: Path,
+        output_dir: Path,
+        profiles: List[QualityProfile],
+        audio_bitrate: str,
+        results: Dict[str, bool]
+    ) -> Dict[str, bool]:
+        """
+        Decode and scale once, then fan raw YUV out to one encoder process per profile.
+        
+        A producer FFmpeg writes each scaled rendition as yuv4mpegpipe to its
+        own pipe (and encodes audio itself); every encoder reads its pipe on
+        stdin, so the renditions encode on separate processes in parallel.
+        
+        Args:
+            input_video: Path to source video file
+            output_dir: Path to output directory (video/)
+            profiles: QualityProfiles to encode
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            results: Result dict prepared by encode_all(), updated in place
+            
+        Returns:
+            The results dict
+        """
+        pipes = [os.pipe() for _ in profiles]
+        processes = []
+        names = []
+        tails = []
+        
+        try:
+            try:
+                for profile, (read_fd, _) in zip(profiles, pipes):
+                    process = self._encode_quality_pipe(output_dir, profile, read_fd)
+                    processes.append(process)
+                    names.append(profile.folder_name)
+                    tails.append(_tail_stderr(process))
+                
+                command = [
+                    "ffmpeg",
+                    "-y",
+                    "-nostats",
+                    "-loglevel", "error",
+                    "-i", str(input_video.absolute()),
+                    "-filter_complex", self._split_scale_filter(profiles),
+                ]
+                for i, (_, write_fd) in enumerate(pipes):
+                    command += ["-map", f"[v{i}]", "-f", "yuv4mpegpipe", f"pipe:{write_fd}"]
+                if "audio" in results:
+                    command += self._audio_output_args(output_dir, audio_bitrate)
+                
+                producer = subprocess.Popen(
+                    command,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    pass_fds=[write_fd for _, write_fd in pipes]
+                )
+                processes.insert(0, producer)
+                names.insert(0, "decode")
+                tails.insert(0, _tail_stderr(producer))
+            finally:
+                # Children hold their own copies; closing ours lets EOF propagate
+                for read_fd, write_fd in pipes:
+                    os.close(read_fd)
+                    os.close(write_fd)
+            
+            # One deadline for the whole fan-out, not one timeout per process
+            deadline = time.monotonic() + 3600 * len(results)
+            for process in processes:
+                process.wait(timeout=max(0, deadline - time.monotonic()))
+            
+            failed = False
+            for process, name, (tail, reader) in zip(processes, names, tails):
+                reader.join()
+                if process.returncode != 0:
+                    failed = True
+                    logging.error("Piped %s failed (exit code %s): %s", name, process.returncode,
+                                  b"".join(tail).decode("utf-8", "replace"))
+            if failed:
+                return results
+            
+            return self._collect_results(output_dir, profiles, results)
+            
+        except Exception:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+            return results
+        finally:
+            for process, (_, reader) in zip(processes, tails):
+                process.wait()
+                reader.join()
+                process.stderr.close()
+    
+    def _encode_quality_pipe(self, output_dir: Path, profile: QualityProfile, read_fd: int) -> subprocess.Popen:
+        """
+        Start an encoder reading one pre-scaled yuv4mpegpipe rendition from a pipe.
+        
+        Args:
+            output_dir: Path to output directory (video/)
+            profile: QualityProfile to encode
+            read_fd: Read end of the pipe the producer writes this rendition to
+            
+        Returns:
+            The running encoder process
+        """
+        quality_dir = (output_dir / profile.folder_name).absolute()
+        quality_dir.mkdir(parents=True, exist_ok=True)
+        command = [
+            "ffmpeg",
+            "-y",
+            "-nostats",
+            "-loglevel", "error",
+        ] + self._hw_device_args() + [
+            "-f", "yuv4mpegpipe",
+            "-i", "pipe:0",
+        ]
+        if self._uses_vaapi(profile):
+            command += ["-vf", "format=nv12,hwupload"]
+        command += self._video_codec_args(profile)
+        command += self._video_hls_args(quality_dir, profile)
+        return subprocess.Popen(
+            command,
+            stdin=read_fd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+    
+    def _split_scale_filter(self, profiles: List[QualityProfile], hw_scale: bool = False) -> str:
+        """
+        Build a filter graph that decodes once and scales per profile.
+        
+        Args:
+            profiles: QualityProfiles to produce, labelled [v0], [v1], ...
+            hw_scale: Upload VAAPI renditions and scale them on the GPU; leave
+                unset when the outputs must stay in system memory (pipes)
+            
+        Returns:
+            filter_complex string
+        """
+        labels = "".join(f"[s{i}]" for i in range(len(profiles)))
+        filters = [f"[0:v]split={len(profiles)}{labels}"]
+        for i, profile in enumerate(profiles):
+            scale = self._scale_filter(profile.height, profile if hw_scale else None)
+            filters.append(f"[s{i}]{scale}[v{i}]")
+        return ";".join(filters)
+    
+    def _scale_filter(
+        self,
+        height: int,
+        profile: Optional[QualityProfile] = None,
+        gpu_frames: bool = False
+    ) -> str:
+        """
+        Build the filter that scales a frame to height, keeping aspect with an even width.
+        
+        Args:
+            height: Output height in pixels
+            profile: Rendition being scaled; VAAPI renditions are uploaded
+                and scaled on the GPU
+            gpu_frames: Frames are already CUDA surfaces (NVENC decode path)
+            
+        Returns:
+            scale, zscale, scale_cuda or scale_vaapi filter expression
+        """
+        if gpu_frames:
+            return f"scale_cuda=-2:{height}"
+        if profile is not None and self._uses_vaapi(profile):
+            return f"format=nv12,hwupload,scale_vaapi=w=-2:h={height}"
+        if self.scaler == "zscale":
+            return f"zscale=w=-2:h={height}:f=lanczos"
+        return f"scale=-2:{height}"
+    
+    def _video_hls_args(self, quality_dir: Path, profile: QualityProfile) -> List[str]:
+        """
+        Build HLS muxer arguments writing a rendition into quality_dir.
+        
+        Args:
+            quality_dir: Absolute path of the quality folder
+            profile: QualityProfile being written
+            
+        Returns:
+            FFmpeg output arguments ending with the playlist path
+        """
+        return [
+            "-f", "hls",
+            "-hls_time", str(self.segment_duration),
+            "-hls_playlist_type", "vod",
+        ] + self._segment_args("video", quality_dir, self.segment_container(profile)) + [
+            str(quality_dir / "video.m3u8")
+        ]
+    
+    def segment_container(self, profile: QualityProfile) -> str:
+        """
+        Get the HLS segment container a profile is written in.
+        
+        Args:
+            profile: QualityProfile to check
+            
+        Returns:
+            "mpegts" for H.264 when the encoder was built with container="mpegts",
+            otherwise "fmp4" (VP9 in HLS requires fMP4)
+        """
+        if self.container == "mpegts" and profile.codec == "h264":
+            return "mpegts"
+        return "fmp4"
+    
+    def _segment_args(
+        self,
+        prefix: str,
+        directory: Optional[Path] = None,
+        container: str = "fmp4"
+    ) -> List[str]:
+        """
+        Build the HLS segment type and naming arguments for a rendition.
+        
+        Args:
+            prefix: Segment file prefix ("video" or "audio")
+            directory: Folder to write segments to (default: relative to cwd)
+            container: "fmp4" (with init.mp4) or "mpegts" (self-contained .ts)
+            
+        Returns:
+            FFmpeg arguments: numbered segments, or with single_file set, one
+            byte-range addressed segment file
+        """
+        extension = SEGMENT_EXTENSIONS[container]
+        if self.single_file:
+            name = f"{prefix}{extension}"
+            flags = "independent_segments+single_file"
+            numbering = []
+        else:
+            name = f"{prefix}%d{extension}"
+            flags = "independent_segments"
+            numbering = ["-start_number", "1"]
+        
+        if directory is not None:
+            name = str(directory / name)
+        
+        args = ["-hls_segment_type", container]
+        if container == "fmp4":
+            args += ["-hls_fmp4_init_filename", "init.mp4"]
+        return args + ["-hls_segment_filename", name, "-hls_flags", flags] + numbering
+    
+    def _audio_output_args(self, output_dir: Path, audio_bitrate: str) -> List[str]:
+        """
+        Build the audio HLS output (audio/aac.m3u8) for a multi-output command.
+        
+        Args:
+            output_dir: Path to output directory (video/)
+            audio_bitrate: Audio bitrate (e.g., "128k")
+            
+        Returns:
+            FFmpeg output arguments ending with the audio playlist path
+        """
+        audio_dir = (output_dir.parent / "audio").absolute()
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        return [
+            "-map", "0:a:0",
+            "-c:a", "aac",
+            "-b:a", audio_bitrate,
+            "-ac", "2",
+            # HLS settings
+            "-f", "hls",
+            "-hls_time", str(self.segment_duration),
+            "-hls_playlist_type", "vod",
+        ] + self._segment_args("audio", audio_dir) + [
+            str(audio_dir / "aac.m3u8")
+        ]
+    
+    def _collect_results(
+        self,
+        output_dir: Path,
+        profiles: List[QualityProfile],
+        results: Dict[str, bool]
+    ) -> Dict[str, bool]:
+        """
+        Mark each output as produced if its playlist and init segment exist.
+        
+        Args:
+            output_dir: Path to output directory (video/)
+            profiles: QualityProfiles that were encoded
+            results: Result dict to update in place
+            
+        Returns:
+            The results dict
+        """
+        output_dir = output_dir.absolute()
+        for profile in profiles:
+            quality_dir = output_dir / profile.folder_name
+            results[profile.folder_name] = self._verify_quality_output(quality_dir, profile)
+        
+        if "audio" in results:
+            results["audio"] = self._verify_audio_output(output_dir.parent / "audio")
+        
+        return results
+    
+    def _uses_vaapi(self, profile: QualityProfile) -> bool:
+        """
+        Check whether a profile is encoded with a VAAPI encoder (which needs GPU frames).
+        
+        Args:
+            profile: QualityProfile to check
+            
+        Returns:
+            True when the profile's codec is encoded with h264_vaapi or vp9_vaapi
+        """
+        if profile.codec == "vp9":
+            return self.vp9_encoder == "vp9_vaapi"
+        return self.h264_encoder == "h264_vaapi"
+    
+    def _hw_device_args(self, gpu_frames: bool = False) -> List[str]:
+        """
+        Build the global/input options the selected hardware encoder needs.
+        
+        Args:
+            gpu_frames: Decode on the GPU and keep frames there (NVENC only)
+            
+        Returns:
+            FFmpeg arguments to place before -i (empty for software encoding)
+        """
+        if self.h264_encoder == "h264_vaapi":
+            return ["-vaapi_device", VAAPI_DEVICE]
+        if gpu_frames and self.h264_encoder == "h264_nvenc":
+            return ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+        return []
+    
+    def _video_codec_args(self, profile: QualityProfile, threads: Optional[int] = None) -> List[str]:
+        """
+        Get the video encoder arguments for a profile (without scaling).
+        
+        The arguments only depend on the encoder settings and the profile, so
+        they are built once per profile and thread count and then reused.
+        
+        Args:
+            profile: QualityProfile to encode
+            threads: Encoder thread limit (default: let FFmpeg decide, except
+                libx264 which is capped by rendition height)
+            
+        Returns:
+            FFmpeg arguments selecting and configuring the video encoder
+        """
+        key = (profile.codec, profile.height, profile.video_bitrate, profile.preset,
+               profile.tune, profile.cpu_used, threads)
+        args = self._codec_args_cache.get(key)
+        if args is None:
+            args = self._codec_args_cache[key] = self._build_video_codec_args(profile, threads)
+        return list(args)
+    
+    def _build_video_codec_args(self, profile: QualityProfile, threads: Optional[int]) -> List[str]:
+        """
+        Build the video encoder arguments for a profile.
+        
+        Args:
+            profile: QualityProfile to encode
+            threads: Encoder thread limit, or None
+            
+        Returns:
+            FFmpeg arguments selecting and configuring the video encoder
+        """
+        bufsize = profile.bufsize
+        if profile.codec == "vp9" and self.vp9_encoder == "vp9_qsv":
+            args = [
+                "-c:v", "vp9_qsv",
+                "-preset", self.preset,
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+            ]
+        elif profile.codec == "vp9" and self.vp9_encoder == "vp9_vaapi":
+            args = [
+                "-c:v", "vp9_vaapi",
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+            ]
+        elif profile.codec == "vp9":
+            args = [
+                "-c:v", "libvpx-vp9",
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+                "-row-mt", "1",  # Enable row-based multithreading for VP9
+                "-deadline", "good",  # VOD quality mode; "realtime" costs too much quality
+                # Speed vs quality tradeoff (0-5, higher is faster)
+                "-cpu-used", str(profile.cpu_used if profile.cpu_used is not None else 4),
+            ]
+        elif self.h264_encoder == "h264_nvenc":
+            # NVENC derives profile and level itself. p4 balances speed and
+            # quality; a profile preset maps onto p1 (fastest) to p7 (best)
+            nvenc_preset = NVENC_PRESET_BY_X264.get(profile.preset, profile.preset) or "p4"
+            args = [
+                "-c:v", "h264_nvenc",
+                "-preset", nvenc_preset,
+                "-tune", "hq",
+                "-rc", "cbr",
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+            ]
+        elif self.h264_encoder == "h264_qsv":
+            args = [
+                "-c:v", "h264_qsv",
+                "-preset", self.preset,
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+                "-profile:v", "main",
+            ]
+        elif self.h264_encoder == "h264_vaapi":
+            args = [
+                "-c:v", "h264_vaapi",
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+                "-profile:v", "main",
+            ]
+        elif self.h264_encoder == "h264_videotoolbox":
+            args = [
+                "-c:v", "h264_videotoolbox",
+                "-prio_speed", "1",
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+                "-profile:v", "main",
+            ]
+        else:
+            preset = profile.preset or H264_PRESET_BY_HEIGHT.get(profile.height, self.preset)
+            args = [
+                "-c:v", "libx264",
+                "-preset", preset,
+                "-b:v", profile.video_bitrate,
+                "-maxrate", profile.video_bitrate,
+                "-bufsize", bufsize,
+                "-profile:v", "main",
+                "-level", "4.0",
+            ]
+            # "zerolatency" disables lookahead and frame threading, cutting
+            # x264's frame buffers (RAM) at some cost in compression
+            tune = profile.tune or self.tune
+            if tune:
+                args += ["-tune", tune]
+            # Keyframes only where forced below, never on scene cuts
+            args += ["-sc_threshold", "0"]
+            # Small frames have little frame-level parallelism: past about one
+            # thread per 90 lines x264 only adds synchronisation overhead
+            height_threads = max(2, min(12, profile.height // 90))
+            threads = min(threads, height_threads) if threads else height_threads
+        
+        if self.h264_encoder == "h264_nvenc" and profile.codec == "h264":
+            # Make NVENC's forced keyframes IDR so every segment starts decodable
+            args += ["-forced-idr", "1"]
+        # A keyframe at every segment boundary keeps segments uniform and
+        # independently decodable, so HLS never has to cut mid-GOP
+        args += ["-force_key_frames", f"expr:gte(t,n_forced*{self.segment_duration})"]
+        if self.fps > 0:
+            gop = max(1, round(self.fps * self.segment_duration))
+            args += ["-g", str(gop)]
+            encoder = self.vp9_encoder if profile.codec == "vp9" else self.h264_encoder
+            if encoder in ("libx264", "libvpx-vp9"):
+                args += ["-keyint_min", str(gop)]
+        
+        if threads:
+            args += ["-threads", str(threads)]
+        return args
+    
     def create_unified_master_playlist(
         self,
         output_dir: Path,
         h264_profiles: List[QualityProfile],
         vp9_profiles: List[QualityProfile],
-        has_audio: bool = True
+        has_audio: bool = True,
+        source_size: Optional[Tuple[int, int]] = None
     ) -> bool:
         """
         Create a single unified master playlist (playlist.m3u8) with all qualities.
@@ -295,74 +1671,43 @@ class HLSEncoder:
             h264_profiles: List of H.264 QualityProfile objects
             vp9_profiles: List of VP9 QualityProfile objects
             has_audio: Whether separate audio track exists
+            source_size: Source (width, height) used to advertise each
+                rendition's real RESOLUTION (default: assume 16:9)
             
         Returns:
             True if master playlist created successfully
         """
         try:
             master_path = output_dir / "playlist.m3u8"
+            lines = ["#EXTM3U\n", "#EXT-X-VERSION:4\n"]
             
-            with open(master_path, 'w') as f:
-                f.write("#EXTM3U\n")
-                f.write("#EXT-X-VERSION:4\n")
-                
-                # Add audio media group if audio exists
-                if has_audio:
-                    audio_path = output_dir.parent / "audio" / "aac.m3u8"
-                    if audio_path.exists():
-                        f.write('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",NAME="English",'
-                               'DEFAULT=YES,AUTOSELECT=YES,LANGUAGE="en",'
-                               'URI="../audio/aac.m3u8"\n')
-                
-                # Add H.264 quality levels first (sorted by bandwidth descending)
-                for profile in sorted(h264_profiles, key=lambda p: p.bandwidth, reverse=True):
-                    quality_dir = output_dir / profile.folder_name
-                    playlist_path = quality_dir / "video.m3u8"
-                    
-                    if not playlist_path.exists():
+            # Add audio media group if audio exists
+            if has_audio:
+                audio_path = output_dir.parent / "audio" / "aac.m3u8"
+                if audio_path.exists():
+                    lines.append('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",NAME="English",'
+                                 'DEFAULT=YES,AUTOSELECT=YES,LANGUAGE="en",'
+                                 'URI="../audio/aac.m3u8"\n')
+            
+            # H.264 quality levels first, then VP9 (each sorted by bandwidth descending)
+            # One listing of video/ rules out missing renditions without a stat each
+            existing = _dir_names(output_dir)
+            for profiles in (h264_profiles, vp9_profiles):
+                for profile in sorted(profiles, key=lambda p: p.bandwidth, reverse=True):
+                    if profile.folder_name not in existing:
                         continue
                     
-                    width = int(profile.height * 16 / 9)
-                    h264_codecs = {720: "avc1.64001f", 360: "avc1.4d401e"}
-                    video_codec = h264_codecs.get(profile.height, "avc1.4d401f")
-                    
-                    if has_audio:
-                        f.write(f"#EXT-X-STREAM-INF:BANDWIDTH={profile.bandwidth},"
-                               f"RESOLUTION={width}x{profile.height},"
-                               f'CODECS="{video_codec},mp4a.40.2",'
-                               f'AUDIO="audio"\n')
-                    else:
-                        f.write(f"#EXT-X-STREAM-INF:BANDWIDTH={profile.bandwidth},"
-                               f"RESOLUTION={width}x{profile.height},"
-                               f'CODECS="{video_codec}"\n')
-                    
-                    f.write(f"{profile.folder_name}/video.m3u8\n")
-                
-                # Add VP9 quality levels (sorted by bandwidth descending)
-                for profile in sorted(vp9_profiles, key=lambda p: p.bandwidth, reverse=True):
-                    quality_dir = output_dir / profile.folder_name
-                    playlist_path = quality_dir / "video.m3u8"
-                    
+                    playlist_path = output_dir / profile.folder_name / "video.m3u8"
                     if not playlist_path.exists():
                         continue
                     
-                    width = int(profile.height * 16 / 9)
-                    vp9_codecs = {720: "vp09.00.31.08.00.01.01.01.00",
-                                 480: "vp09.00.30.08.00.01.01.01.00",
-                                 360: "vp09.00.21.08.00.01.01.01.00"}
-                    video_codec = vp9_codecs.get(profile.height, "vp09.00.30.08.00.01.01.01.00")
-                    
-                    if has_audio:
-                        f.write(f"#EXT-X-STREAM-INF:BANDWIDTH={profile.bandwidth},"
-                               f"RESOLUTION={width}x{profile.height},"
-                               f'CODECS="{video_codec},mp4a.40.2",'
-                               f'AUDIO="audio"\n')
-                    else:
-                        f.write(f"#EXT-X-STREAM-INF:BANDWIDTH={profile.bandwidth},"
-                               f"RESOLUTION={width}x{profile.height},"
-                               f'CODECS="{video_codec}"\n')
-                    
-                    f.write(f"{profile.folder_name}/video.m3u8\n")
+                    lines.append(_stream_inf(
+                        profile.codec, _rendition_width(profile.height, source_size),
+                        profile.height, profile.bandwidth, profile.folder_name, has_audio
+                    ))
+            
+            # Build the whole playlist in memory and swap it in with one rename
+            _write_atomic(master_path, "".join(lines).encode("utf-8"))
             
             return True
             
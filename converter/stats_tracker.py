@@ -48,7 +48,7 @@ class StatsTracker:
             size_bytes: Size in bytes to add to source total
         """
         self._total_source_bytes += size_bytes
-        logging.debug(f"Added {size_bytes} bytes to source size (total: {self._total_source_bytes})")
+        logging.debug("Added %s bytes to source size (total: %s)", size_bytes, self._total_source_bytes)
     
     def add_output_size(self, size_bytes: int) -> None:
         """
@@ -58,27 +58,27 @@ class StatsTracker:
             size_bytes: Size in bytes to add to output total
         """
         self._total_output_bytes += size_bytes
-        logging.debug(f"Added {size_bytes} bytes to output size (total: {self._total_output_bytes})")
+        logging.debug("Added %s bytes to output size (total: %s)", size_bytes, self._total_output_bytes)
     
     def record_success(self) -> None:
         """Record a successful conversion."""
         self._successful_conversions += 1
-        logging.debug(f"Recorded successful conversion (total: {self._successful_conversions})")
+        logging.debug("Recorded successful conversion (total: %s)", self._successful_conversions)
     
     def record_failure(self) -> None:
         """Record a failed conversion."""
         self._failed_conversions += 1
-        logging.debug(f"Recorded failed conversion (total: {self._failed_conversions})")
+        logging.debug("Recorded failed conversion (total: %s)", self._failed_conversions)
     
     def record_skipped_no_mp4(self) -> None:
         """Record a folder skipped due to no MP4 files."""
         self._skipped_no_mp4 += 1
-        logging.debug(f"Recorded skipped folder (no MP4): {self._skipped_no_mp4}")
+        logging.debug("Recorded skipped folder (no MP4): %s", self._skipped_no_mp4)
     
     def record_skipped_multiple_mp4(self) -> None:
         """Record a folder skipped due to multiple MP4 files."""
         self._skipped_multiple_mp4 += 1
-        logging.debug(f"Recorded skipped folder (multiple MP4): {self._skipped_multiple_mp4}")
+        logging.debug("Recorded skipped folder (multiple MP4): %s", self._skipped_multiple_mp4)
     
     def get_summary(self) -> StatsSummary:
         """
@@ -149,12 +149,14 @@ class StatsTracker:
         print("=" * 60 + "\n")
         
         logging.info(
-            f"Statistics: {summary.total_source_gb:.2f} GB source, "
-            f"{summary.total_output_gb:.2f} GB output, "
-            f"{summary.successful_conversions} successful, "
-            f"{summary.failed_conversions} failed, "
-            f"{summary.skipped_folders} skipped, "
-            f"runtime: {self._format_time(total_runtime)}"
+            "Statistics: %.2f GB source, %.2f GB output, %s successful, "
+            "%s failed, %s skipped, runtime: %s",
+            summary.total_source_gb,
+            summary.total_output_gb,
+            summary.successful_conversions,
+            summary.failed_conversions,
+            summary.skipped_folders,
+            self._format_time(total_runtime)
         )
     
     def _format_time(self, seconds: float) -> str:
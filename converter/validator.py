@@ -27,22 +27,22 @@ class Validator:
         """
         try:
             if not playlist_path.exists():
-                logging.error(f"Playlist file does not exist: {playlist_path}")
+                logging.error("Playlist file does not exist: %s", playlist_path)
                 return False
             
             if not playlist_path.is_file():
-                logging.error(f"Playlist path is not a file: {playlist_path}")
+                logging.error("Playlist path is not a file: %s", playlist_path)
                 return False
             
             # Try to read the file to ensure it's readable
             with open(playlist_path, 'r') as f:
                 f.read(1)  # Read at least one character
             
-            logging.debug(f"Playlist file exists and is readable: {playlist_path}")
+            logging.debug("Playlist file exists and is readable: %s", playlist_path)
             return True
             
         except Exception as e:
-            logging.error(f"Error checking playlist file: {e}")
+            logging.error("Error checking playlist file: %s", e)
             return False
     
     def _parse_playlist(self, playlist_path: Path) -> List[str]:
@@ -61,18 +61,18 @@ class Validator:
             with open(playlist_path, 'r') as f:
                 for line in f:
                     line = line.strip()
-                    # Segment files end with .m4s
-                    if line.endswith('.m4s'):
+                    # Segment files end with .m4s (fMP4) or .ts (MPEG-TS)
+                    if line.endswith(('.m4s', '.ts')):
                         segment_files.append(line)
                     # Also check for init segment
                     elif line.endswith('.mp4') and 'init' in line.lower():
                         segment_files.append(line)
             
-            logging.debug(f"Parsed {len(segment_files)} segment references from playlist")
+            logging.debug("Parsed %s segment references from playlist", len(segment_files))
             return segment_files
             
         except Exception as e:
-            logging.error(f"Error parsing playlist file: {e}")
+            logging.error("Error parsing playlist file: %s", e)
             return []
     
     def _check_segments_exist(self, segment_files: List[Path]) -> bool:
@@ -95,10 +95,10 @@ class Validator:
                 missing_files.append(segment_file.name)
         
         if missing_files:
-            logging.error(f"Missing segment files: {', '.join(missing_files)}")
+            logging.error("Missing segment files: %s", ', '.join(missing_files))
             return False
         
-        logging.debug(f"All {len(segment_files)} segment files exist")
+        logging.debug("All %s segment files exist", len(segment_files))
         return True
     
     def _validate_with_ffmpeg(self, playlist_path: Path) -> bool:
@@ -134,13 +134,13 @@ class Validator:
                 "-"
             ]
             
-            logging.debug(f"Running FFmpeg validation: {' '.join(command)}")
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("Running FFmpeg validation: %s", ' '.join(command))
             # Run from the playlist's directory to resolve relative paths
             result = subprocess.run(
                 command,
-                stdout=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
-                text=True,
                 timeout=30,
                 cwd=str(playlist_path.parent)
             )
@@ -149,14 +149,14 @@ class Validator:
                 logging.debug("FFmpeg validation successful: playlist is playable")
                 return True
             else:
-                logging.error(f"FFmpeg validation failed: {result.stderr}")
+                logging.error("FFmpeg validation failed: %s", result.stderr[-1000:].decode("utf-8", "replace"))
                 return False
                 
         except subprocess.TimeoutExpired:
             logging.error("FFmpeg validation timed out")
             return False
         except Exception as e:
-            logging.error(f"Error during FFmpeg validation: {e}")
+            logging.error("Error during FFmpeg validation: %s", e)
             return False
     
     def validate_hls_output(self, conversion_result: ConversionResult) -> ValidationResult:
@@ -169,7 +169,7 @@ class Validator:
         Returns:
             ValidationResult with detailed validation status
         """
-        logging.info(f"Starting HLS validation for {conversion_result.playlist_file.name}")
+        logging.info("Starting HLS validation for %s", conversion_result.playlist_file.name)
         
         # If conversion itself failed, return invalid result immediately
         if not conversion_result.success:
@@ -220,7 +220,7 @@ class Validator:
                 error_message=error_msg
             )
         
-        logging.debug(f"Init file validated: {conversion_result.init_file.name} ({init_size} bytes)")
+        logging.debug("Init file validated: %s (%s bytes)", conversion_result.init_file.name, init_size)
         
         # Step 3: Check if all segment files exist
         all_files = [conversion_result.init_file] + conversion_result.segment_files
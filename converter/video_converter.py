@@ -1,26 +1,99 @@
 """Video conversion to HLS format with multiple quality levels."""
 
 import logging
+import os
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
-from converter.video_quality import VideoQualityDetector
-from converter.hls_encoder import HLSEncoder
-from converter.data_models import ConversionResult
+from converter.video_quality import VideoQualityDetector, probe_video
+from converter.hls_encoder import HLSEncoder, SEGMENT_EXTENSIONS
+from converter.chunked_hls_encoder import ChunkedHLSEncoder
+from converter.data_models import ConversionResult, VideoPaths
+
+
+def _list_segments(directory: Path, prefix: str, extension: str) -> List[Path]:
+    """
+    Collect a rendition's segment files in one directory pass.
+    
+    Args:
+        directory: Rendition folder
+        prefix: Segment name prefix ("video" or "audio")
+        extension: Segment extension (".m4s" or ".ts")
+        
+    Returns:
+        Paths of the matching segment files (empty if the folder is missing)
+    """
+    try:
+        with os.scandir(directory) as it:
+            return [
+                Path(entry.path) for entry in it
+                if entry.name.startswith(prefix) and entry.name.endswith(extension)
+            ]
+    except OSError:
+        return []
 
 
 class VideoConverter:
     """Converts MP4 files to HLS format using FFmpeg."""
     
-    def __init__(self, segment_duration: int = 5):
+    def __init__(
+        self,
+        segment_duration: int = 5,
+        pipe_fanout: bool = False,
+        max_parallel: int = 1,
+        hw_encoder: str = "none",
+        stage_input: bool = False,
+        cascade: bool = False,
+        single_file: bool = False,
+        container: str = "fmp4",
+        scaler: str = "scale",
+        pin_cpus: bool = False,
+        chunked: bool = False
+    ):
         """
         Initialize VideoConverter with configurable segment duration.
         
         Args:
             segment_duration: Duration of each HLS segment in seconds (default: 5)
+            pipe_fanout: Encode renditions in parallel processes fed from one
+                decode over pipes (POSIX only, default: False)
+            max_parallel: When above 1, encode renditions as separate FFmpeg
+                runs this many at a time instead of one multi-output pass
+            hw_encoder: H.264 hardware encoder passed to HLSEncoder ("none",
+                "auto", "nvenc", "qsv", "vaapi" or "videotoolbox", default: "none")
+            stage_input: Copy the source to tmpfs once before encoding so
+                every pass, including retries, reads it from RAM (default: False)
+            cascade: With max_parallel above 1, scale the lower renditions
+                from a mezzanine of the top one (default: False)
+            single_file: Write each rendition as one byte-range addressed
+                .m4s instead of one file per segment (default: False)
+            container: H.264 segment container, "fmp4" or "mpegts" (default: "fmp4")
+            scaler: Rendition scaler, "scale" or "zscale" (default: "scale")
+            pin_cpus: With max_parallel above 1, pin each concurrent encode
+                to its own set of cores (Linux with taskset, default: False)
+            chunked: Split the source into chunks and encode max_parallel
+                (rendition, chunk) pairs at a time with ChunkedHLSEncoder;
+                at least two run at once, and pin_cpus applies to them. Not
+                combinable with single_file (default: False)
+                
+        Raises:
+            ValueError: If chunked and single_file are both set
         """
+        if chunked and single_file:
+            raise ValueError("single_file is not supported with chunked encoding")
+        
         self.segment_duration = segment_duration
+        self.pipe_fanout = pipe_fanout
+        self.max_parallel = max_parallel
+        self.hw_encoder = hw_encoder
+        self.stage_input = stage_input
+        self.cascade = cascade
+        self.single_file = single_file
+        self.container = container
+        self.scaler = scaler
+        self.pin_cpus = pin_cpus
+        self.chunked = chunked
     
     def get_video_duration(self, video_path: Path) -> Optional[float]:
         """
@@ -32,32 +105,10 @@ class VideoConverter:
         Returns:
             Duration in seconds, or None if unable to determine
         """
-        try:
-            command = [
-                "ffprobe",
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(video_path.absolute())
-            ]
-            
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                duration = float(result.stdout.strip())
-                return duration
-            else:
-                return None
-                
-        except Exception as e:
-            logging.error(f"Error getting video duration: {e}")
+        video_info = probe_video(video_path)
+        if video_info is None or video_info.duration <= 0:
             return None
+        return video_info.duration
     
     def generate_trailer(self, video_path: Path, output_folder: Path, duration: float = 4.0) -> bool:
         """
@@ -104,18 +155,19 @@ class VideoConverter:
                 str(output_file.absolute())
             ]
             
-            logging.info(f"Generating trailer: start={start_time:.2f}s, duration={duration}s")
+            logging.info("Generating trailer: start=%.2fs, duration=%ss", start_time, duration)
             
             result = subprocess.run(
                 command,
-                stdout=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
-                text=True,
                 timeout=300  # Increased timeout for longer videos
             )
             
             if result.returncode != 0:
-                logging.error(f"FFmpeg trailer generation failed: {result.stderr}")
+                # Decode only the tail that gets logged
+                logging.error("FFmpeg trailer generation failed: %s",
+                              result.stderr[-1000:].decode("utf-8", "replace"))
                 return False
             
             if not output_file.exists():
@@ -128,24 +180,24 @@ class VideoConverter:
                 output_file.unlink()  # Remove empty file
                 return False
             
-            logging.info(f"Trailer generated successfully: {output_file.name}")
+            logging.info("Trailer generated successfully: %s", output_file.name)
             return True
             
         except subprocess.TimeoutExpired:
             logging.error("Trailer generation timed out")
             return False
         except Exception as e:
-            logging.error(f"Error generating trailer: {e}", exc_info=True)
+            logging.error("Error generating trailer: %s", e, exc_info=True)
             return False
     
-    def extract_thumbnails(self, video_path: Path, output_folder: Path, percentages: List[int]) -> bool:
+    def extract_thumbnails(self, video_path: Path, output_folder: Path, percentages: Sequence[int]) -> bool:
         """
         Extract thumbnails from video at specified percentage points.
         
         Args:
             video_path: Path to the source video file
             output_folder: Path to the folder where thumbnails should be saved (same level as video/)
-            percentages: List of percentage values (e.g., [30, 50, 70])
+            percentages: Sequence of percentage values (e.g., [30, 50, 70])
             
         Returns:
             True if all thumbnails were extracted successfully, False otherwise
@@ -181,9 +233,8 @@ class VideoConverter:
                     
                     result = subprocess.run(
                         command,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
                         timeout=30
                     )
                     
@@ -191,12 +242,12 @@ class VideoConverter:
                         success_count += 1
                         
                 except Exception as e:
-                    logging.error(f"Error extracting thumbnail {idx}: {e}")
+                    logging.error("Error extracting thumbnail %s: %s", idx, e)
             
             return success_count == len(percentages)
                 
         except Exception as e:
-            logging.error(f"Error during thumbnail extraction: {e}", exc_info=True)
+            logging.error("Error during thumbnail extraction: %s", e, exc_info=True)
             return False
     
     def convert_to_hls(self, input_mp4: Path, output_dir: Path) -> ConversionResult:
@@ -210,31 +261,19 @@ class VideoConverter:
         Returns:
             ConversionResult with success status and file paths
         """
+        paths = VideoPaths.for_output(output_dir)
+        encoder = None
+        source = input_mp4
+        
         try:
             # Validate input file
             if not input_mp4.exists():
-                error_msg = f"Input MP4 file does not exist"
-                return ConversionResult(
-                    success=False,
-                    output_path=output_dir,
-                    playlist_file=output_dir / "video" / "playlist.m3u8",
-                    init_file=output_dir / "video" / "720p" / "init.mp4",
-                    segment_files=[],
-                    error_message=error_msg
-                )
+                return self._failed_result(paths, "Input MP4 file does not exist")
             
             if not input_mp4.is_file():
-                error_msg = f"Input path is not a file"
-                return ConversionResult(
-                    success=False,
-                    output_path=output_dir,
-                    playlist_file=output_dir / "video" / "playlist.m3u8",
-                    init_file=output_dir / "video" / "720p" / "init.mp4",
-                    segment_files=[],
-                    error_message=error_msg
-                )
+                return self._failed_result(paths, "Input path is not a file")
             
-            video_dir = output_dir / "video"
+            video_dir = paths.video
             video_dir.mkdir(parents=True, exist_ok=True)
             
             # Step 1: Detect video quality
@@ -242,102 +281,101 @@ class VideoConverter:
             video_info = detector.get_video_info(input_mp4)
             
             if video_info is None:
-                error_msg = "Failed to detect video information"
-                return ConversionResult(
-                    success=False,
-                    output_path=output_dir,
-                    playlist_file=video_dir / "playlist.m3u8",
-                    init_file=video_dir / "720p" / "init.mp4",
-                    segment_files=[],
-                    error_message=error_msg
-                )
+                return self._failed_result(paths, "Failed to detect video information")
             
             source_quality = detector.determine_source_quality(video_info)
             encoding_profiles = detector.get_encoding_profiles(source_quality)
             
             if not encoding_profiles:
-                error_msg = "No encoding profiles determined"
-                return ConversionResult(
-                    success=False,
-                    output_path=output_dir,
-                    playlist_file=video_dir / "playlist.m3u8",
-                    init_file=video_dir / "720p" / "init.mp4",
-                    segment_files=[],
-                    error_message=error_msg
-                )
+                return self._failed_result(paths, "No encoding profiles determined")
             
-            # Step 2: Encode audio separately (shared between H.264 and VP9)
-            encoder = HLSEncoder(segment_duration=self.segment_duration)
-            audio_success = encoder.encode_audio(input_mp4, video_dir, audio_bitrate="128k")
+            vp9_encoding_profiles = detector.get_encoding_profiles(source_quality, codec="vp9")
+            
+            # Step 2: Encode audio and all H.264/VP9 quality levels from a single decode
+            encoder_class = ChunkedHLSEncoder if self.chunked else HLSEncoder
+            encoder = encoder_class(segment_duration=self.segment_duration,
+                                    pipe_fanout=self.pipe_fanout,
+                                    max_parallel=self.max_parallel,
+                                    hw_encoder=self.hw_encoder,
+                                    cascade=self.cascade,
+                                    single_file=self.single_file,
+                                    container=self.container,
+                                    scaler=self.scaler,
+                                    pin_cpus=self.pin_cpus,
+                                    fps=video_info.fps)
+            if self.stage_input:
+                # Stage once here so the retries below read the same copy
+                source = encoder.stage_input(input_mp4)
+            if self.chunked or self.max_parallel <= 1:
+                encode = encoder.encode_all
+            else:
+                encode = encoder.encode_all_parallel
+            results = encode(
+                source, video_dir, encoding_profiles + vp9_encoding_profiles,
+                audio_bitrate="128k", include_audio=video_info.has_audio
+            )
+            
+            # Step 3: Retry anything the single pass did not produce, one output at a time
+            audio_success = results.get("audio", False)
+            if not audio_success and video_info.has_audio:
+                audio_success = encoder.encode_audio(source, video_dir, audio_bitrate="128k")
             
-            # Step 3: Encode H.264 quality levels
             encoded_h264_profiles = []
+            encoded_vp9_profiles = []
             all_segment_files = []
             
-            for profile in encoding_profiles:
-                success = encoder.encode_quality(input_mp4, video_dir, profile)
+            for profile in encoding_profiles + vp9_encoding_profiles:
+                success = results.get(profile.folder_name, False)
+                if not success:
+                    success = encoder.encode_quality(source, video_dir, profile)
                 
                 if success:
-                    encoded_h264_profiles.append(profile)
+                    if profile.codec == "vp9":
+                        encoded_vp9_profiles.append(profile)
+                    else:
+                        encoded_h264_profiles.append(profile)
                     quality_dir = video_dir / profile.folder_name
-                    segments = list(quality_dir.glob("video*.m4s"))
-                    all_segment_files.extend(segments)
+                    extension = SEGMENT_EXTENSIONS[encoder.segment_container(profile)]
+                    all_segment_files.extend(_list_segments(quality_dir, "video", extension))
             
             if not encoded_h264_profiles:
-                error_msg = "Failed to encode any H.264 quality levels"
-                return ConversionResult(
-                    success=False,
-                    output_path=output_dir,
-                    playlist_file=video_dir / "playlist.m3u8",
-                    init_file=video_dir / "720p" / "init.mp4",
-                    segment_files=[],
-                    error_message=error_msg
-                )
-            
-            # Step 4: Encode VP9 quality levels
-            vp9_encoding_profiles = detector.get_encoding_profiles(source_quality, codec="vp9")
-            encoded_vp9_profiles = []
-            
-            for profile in vp9_encoding_profiles:
-                success = encoder.encode_quality(input_mp4, video_dir, profile)
-                
-                if success:
-                    encoded_vp9_profiles.append(profile)
-                    quality_dir = video_dir / profile.folder_name
-                    segments = list(quality_dir.glob("video*.m4s"))
-                    all_segment_files.extend(segments)
+                return self._failed_result(paths, "Failed to encode any H.264 quality levels")
             
             # Add audio segments to the list if audio was encoded
             if audio_success:
                 audio_dir = output_dir / "audio"
-                audio_segments = list(audio_dir.glob("audio*.m4s"))
-                all_segment_files.extend(audio_segments)
+                all_segment_files.extend(_list_segments(audio_dir, "audio", ".m4s"))
             
-            # Step 5: Create unified master playlist (playlist.m3u8) with all qualities
+            # Step 4: Create unified master playlist (playlist.m3u8) with all qualities
             unified_success = encoder.create_unified_master_playlist(
-                video_dir, encoded_h264_profiles, encoded_vp9_profiles, has_audio=audio_success
+                video_dir, encoded_h264_profiles, encoded_vp9_profiles, has_audio=audio_success,
+                source_size=(video_info.width, video_info.height)
+            )
+            
+            # Use the unified playlist as the main playlist
+            # MPEG-TS renditions have no init segment; fall back to VP9's, then audio's
+            first_init = next(
+                (video_dir / profile.folder_name / "init.mp4"
+                 for profile in encoded_h264_profiles + encoded_vp9_profiles
+                 if encoder.segment_container(profile) == "fmp4"),
+                output_dir / "audio" / "init.mp4"
             )
             
             if not unified_success:
-                error_msg = "Failed to create master playlist"
                 return ConversionResult(
                     success=False,
                     output_path=output_dir,
-                    playlist_file=video_dir / "playlist.m3u8",
-                    init_file=video_dir / encoded_h264_profiles[0].folder_name / "init.mp4",
+                    playlist_file=paths.playlist,
+                    init_file=first_init,
                     segment_files=all_segment_files,
-                    error_message=error_msg
+                    error_message="Failed to create master playlist"
                 )
             
             # Success!
-            # Use the unified playlist as the main playlist
-            master_playlist = video_dir / "playlist.m3u8"
-            first_init = video_dir / encoded_h264_profiles[0].folder_name / "init.mp4"
-            
             return ConversionResult(
                 success=True,
                 output_path=output_dir,
-                playlist_file=master_playlist,
+                playlist_file=paths.playlist,
                 init_file=first_init,
                 segment_files=all_segment_files,
                 error_message=None
@@ -346,11 +384,27 @@ class VideoConverter:
         except Exception as e:
             error_msg = f"Unexpected error during conversion: {str(e)}"
             logging.error(error_msg, exc_info=True)
-            return ConversionResult(
-                success=False,
-                output_path=output_dir,
-                playlist_file=output_dir / "video" / "playlist.m3u8",
-                init_file=output_dir / "video" / "720p" / "init.mp4",
-                segment_files=[],
-                error_message=error_msg
-            )
+            return self._failed_result(paths, error_msg)
+        finally:
+            if encoder is not None:
+                encoder.cleanup_input(source, input_mp4)
+    
+    def _failed_result(self, paths: VideoPaths, error_msg: str) -> ConversionResult:
+        """
+        Build a failed ConversionResult pointing at the default output paths.
+        
+        Args:
+            paths: Precomputed VideoPaths for the output folder
+            error_msg: Description of the failure
+            
+        Returns:
+            ConversionResult with success=False
+        """
+        return ConversionResult(
+            success=False,
+            output_path=paths.root,
+            playlist_file=paths.playlist,
+            init_file=paths.init,
+            segment_files=[],
+            error_message=error_msg
+        )
@@ -1,8 +1,10 @@
 """Video quality detection and configuration."""
 
+import json
 import logging
 import subprocess
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional, Tuple
 
@@ -14,6 +16,8 @@ class VideoInfo:
     height: int
     bitrate: int
     duration: float
+    fps: float = 0.0
+    has_audio: bool = True
 
 
 @dataclass
@@ -25,6 +29,14 @@ class QualityProfile:
     audio_bitrate: str  # e.g., "128k"
     bandwidth: int  # For master playlist
     codec: str = "h264"  # "h264" or "vp9"
+    preset: Optional[str] = None  # libx264 preset override, e.g. "ultrafast" (mapped to p1-p7 for NVENC)
+    tune: Optional[str] = None  # libx264 tune override; "zerolatency" drops lookahead buffering to save RAM
+    cpu_used: Optional[int] = None  # libvpx-vp9 -cpu-used override (0-5, higher is faster)
+    bufsize: str = field(init=False, repr=False)  # VBV buffer, 2x video_bitrate
+    
+    def __post_init__(self):
+        """Derive the encoder VBV buffer size once instead of on every encode."""
+        self.bufsize = f"{int(self.video_bitrate.rstrip('k')) * 2}k"
     
     @property
     def folder_name(self) -> str:
@@ -65,6 +77,102 @@ QUALITY_ORDER_VP9 = ["720p", "480p", "360p"]
 QUALITY_ORDER = ["720p", "480p", "360p"]  # Combined for source detection
 
 
+# Probe results kept for re-use by quality detection, thumbnails and trailers
+PROBE_CACHE_SIZE = 64
+
+
+def _parse_rate(rate: str) -> float:
+    """
+    Parse an FFprobe frame rate such as "30000/1001".
+    
+    Args:
+        rate: Rational or decimal frame rate string
+        
+    Returns:
+        Frames per second, 0.0 if unknown
+    """
+    try:
+        num, _, den = rate.partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+@lru_cache(maxsize=PROBE_CACHE_SIZE)
+def _probe(path: str, mtime_ns: int, size: int) -> Optional[VideoInfo]:
+    """
+    Run one FFprobe over streams and format (cached per file version).
+    
+    Args:
+        path: Absolute path of the video file
+        mtime_ns: File modification time, part of the cache key
+        size: File size, part of the cache key
+        
+    Returns:
+        VideoInfo object or None if probing fails
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-print_format", "json",
+                "-show_streams",
+                "-show_format",
+                path
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=30
+        )
+        
+        if result.returncode != 0:
+            logging.error("FFprobe failed: %s", result.stderr[-1000:].decode("utf-8", "replace"))
+            return None
+        
+        data = json.loads(result.stdout)
+        streams = data.get("streams", [])
+        video = next((st for st in streams if st.get("codec_type") == "video"), None)
+        if video is None or "width" not in video or "height" not in video:
+            logging.error("No video stream found in FFprobe output for %s", path)
+            return None
+        
+        bitrate = video.get("bit_rate", "")
+        duration = data.get("format", {}).get("duration", "")
+        return VideoInfo(
+            width=int(video["width"]),
+            height=int(video["height"]),
+            bitrate=int(bitrate) if bitrate.isdigit() else 0,
+            duration=float(duration) if duration and duration != "N/A" else 0.0,
+            fps=_parse_rate(video.get("avg_frame_rate", "")) or _parse_rate(video.get("r_frame_rate", "")),
+            has_audio=any(st.get("codec_type") == "audio" for st in streams)
+        )
+        
+    except Exception as e:
+        logging.error("Error detecting video info: %s", e, exc_info=True)
+        return None
+
+
+def probe_video(video_path: Path) -> Optional[VideoInfo]:
+    """
+    Get a video's dimensions, bitrate, duration, frame rate and audio presence.
+    
+    The FFprobe result is cached until the file changes, so repeated callers
+    (quality detection, thumbnails, trailer) share a single probe.
+    
+    Args:
+        video_path: Path to the video file
+        
+    Returns:
+        VideoInfo object or None if probing fails
+    """
+    try:
+        st = video_path.stat()
+    except OSError:
+        return None
+    return _probe(str(video_path.absolute()), st.st_mtime_ns, st.st_size)
+
+
 class VideoQualityDetector:
     """Detects video quality and determines appropriate encoding profiles."""
     
@@ -82,73 +190,15 @@ class VideoQualityDetector:
         Returns:
             VideoInfo object or None if detection fails
         """
-        try:
-            logging.debug(f"Detecting video info for {video_path.name}")
-            
-            # Get video dimensions and bitrate from stream
-            stream_command = [
-                "ffprobe",
-                "-v", "error",
-                "-select_streams", "v:0",
-                "-show_entries", "stream=width,height,bit_rate",
-                "-of", "csv=p=0",
-                str(video_path.absolute())
-            ]
-            
-            stream_result = subprocess.run(
-                stream_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=30
-            )
-            
-            if stream_result.returncode != 0:
-                logging.error(f"FFprobe stream query failed: {stream_result.stderr}")
-                return None
-            
-            # Parse stream output: width,height,bitrate
-            stream_parts = stream_result.stdout.strip().split(',')
-            if len(stream_parts) < 2:
-                logging.error(f"Unexpected FFprobe stream output: {stream_result.stdout}")
-                return None
-            
-            width = int(stream_parts[0])
-            height = int(stream_parts[1])
-            bitrate = int(stream_parts[2]) if len(stream_parts) > 2 and stream_parts[2] and stream_parts[2] != 'N/A' else 0
-            
-            # Get duration from format
-            format_command = [
-                "ffprobe",
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "csv=p=0",
-                str(video_path.absolute())
-            ]
-            
-            format_result = subprocess.run(
-                format_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=30
-            )
-            
-            duration = 0.0
-            if format_result.returncode == 0 and format_result.stdout.strip():
-                try:
-                    duration = float(format_result.stdout.strip())
-                except ValueError:
-                    logging.warning(f"Could not parse duration: {format_result.stdout}")
-            
-            video_info = VideoInfo(width, height, bitrate, duration)
-            logging.info(f"Video info: {width}x{height}, bitrate={bitrate}, duration={duration:.2f}s")
-            
-            return video_info
-            
-        except Exception as e:
-            logging.error(f"Error detecting video info: {e}", exc_info=True)
-            return None
+        logging.debug("Detecting video info for %s", video_path.name)
+        video_info = probe_video(video_path)
+        
+        if video_info is not None:
+            logging.info("Video info: %dx%d, bitrate=%d, fps=%.3f, duration=%.2fs, audio=%s",
+                         video_info.width, video_info.height, video_info.bitrate,
+                         video_info.fps, video_info.duration, video_info.has_audio)
+        
+        return video_info
     
     def determine_source_quality(self, video_info: VideoInfo) -> str:
         """
@@ -171,7 +221,7 @@ class VideoQualityDetector:
         else:  # 360p and below
             quality = "360p"
         
-        logging.info(f"Source video quality determined: {quality} (height={height})")
+        logging.info("Source video quality determined: %s (height=%s)", quality, height)
         return quality
     
     def get_encoding_profiles(self, source_quality: str, codec: str = "h264") -> List[QualityProfile]:
@@ -223,5 +273,7 @@ class VideoQualityDetector:
             if quality in profile_set:
                 profiles.append(profile_set[quality])
         
-        logging.info(f"Encoding profiles for {source_quality} ({codec}): {[p.name for p in profiles]}")
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info("Encoding profiles for %s (%s): %s", source_quality, codec,
+                         ", ".join(p.name for p in profiles))
         return profiles
@@ -47,6 +47,7 @@ def main():
     print("Press Ctrl+C to stop after current video completes")
     print("=" * 60)
     
+    file_processor = None
     try:
         # Load configuration
         config = ConfigManager()
@@ -63,25 +64,25 @@ def main():
         stats.start_timer()
         file_processor = FileProcessor(config.input_directory, config.output_directory)
         
-        # Find source folders
-        source_folders = file_processor.find_source_folders()
+        # Find source folders and filter them as the input directory is scanned
+        # - only process folders with exactly 1 MP4 file
+        found_source_folders = False
+        valid_folders = []
+        for folder in file_processor.find_source_folders():
+            found_source_folders = True
+            scan = file_processor.classify_folder(folder)
+            if scan.status == "valid":
+                valid_folders.append((folder, scan))
+            elif scan.status == "no_mp4":
+                stats.record_skipped_no_mp4()
+            elif scan.status == "multiple_mp4":
+                stats.record_skipped_multiple_mp4()
         
-        if not source_folders:
+        if not found_source_folders:
             print("[ERROR] No subdirectories found in input directory")
             stats.print_summary()
             return 0
         
-        # Filter folders - only process folders with exactly 1 MP4 file
-        valid_folders = []
-        for folder in source_folders:
-            is_valid, reason = file_processor.has_single_mp4_file(folder)
-            if is_valid:
-                valid_folders.append(folder)
-            elif reason == "no_mp4":
-                stats.record_skipped_no_mp4()
-            elif reason == "multiple_mp4":
-                stats.record_skipped_multiple_mp4()
-        
         if not valid_folders:
             print("[ERROR] No valid folders to process (folders must contain exactly 1 MP4 file)")
             stats.print_summary()
@@ -90,7 +91,7 @@ def main():
         print(f"\nFound {len(valid_folders)} video(s) to process\n")
         
         # Process each valid folder
-        for idx, folder in enumerate(valid_folders, 1):
+        for idx, (folder, scan) in enumerate(valid_folders, 1):
             # Check if stop was requested before starting new video
             # Check both signal handler and stop file (for GUI)
             stop_file = Path(".converter_stop_signal")
@@ -114,7 +115,7 @@ def main():
             try:
                 # Phase 1: Validating folder
                 progress.next_phase("Validating folder")
-                mp4_file = file_processor.get_mp4_file(folder)
+                mp4_file = scan.mp4_path
                 if not mp4_file:
                     stats.end_video_timer()
                     progress.finish(success=False)
@@ -169,7 +170,7 @@ def main():
                     continue
                 
                 # Copy non-MP4 files (including data.json)
-                file_processor.copy_non_mp4_files(folder, output_folder)
+                file_processor.copy_non_mp4_files(folder, output_folder, scan.sidecar_files)
                 
                 # Phase 6: Creating thumbnails
                 progress.next_phase("Creating thumbnails")
@@ -184,7 +185,7 @@ def main():
                     if not trailer_success:
                         print(f"[WARNING] Failed to generate trailer for {folder.name}")
                 elif video_duration is not None:
-                    logging.debug(f"Skipping trailer: video duration {video_duration:.1f}s <= 60s")
+                    logging.debug("Skipping trailer: video duration %.1fs <= 60s", video_duration)
                 
                 # Track output size
                 output_size = file_processor.get_folder_size(output_folder)
@@ -196,8 +197,8 @@ def main():
                 # Compress if enabled
                 if config.compress:
                     try:
-                        compressor = ZipCompressor()
-                        zip_path = config.output_directory / f"{folder.name}.zip"
+                        compressor = ZipCompressor(config.archive_format)
+                        zip_path = config.output_directory / f"{folder.name}{compressor.archive_extension}"
                         compression_success = compressor.compress_folder(output_folder, zip_path)
                         
                         if compression_success:
@@ -207,9 +208,9 @@ def main():
                             try:
                                 shutil.rmtree(output_folder)
                             except Exception as e:
-                                logger.error(f"Error deleting uncompressed folder: {e}")
+                                logger.error("Error deleting uncompressed folder: %s", e)
                     except Exception as e:
-                        logger.error(f"Error during compression: {e}")
+                        logger.error("Error during compression: %s", e)
                 
                 # Delete source folder if enabled
                 if config.delete_mp4:
@@ -241,6 +242,10 @@ def main():
     except Exception as e:
         print(f"[ERROR] Fatal error: {e}")
         return 1
+    finally:
+        # Also runs on a fatal error or Ctrl+C, so the copy pool is always shut down
+        if file_processor is not None:
+            file_processor.close()
 
 
 if __name__ == "__main__":